@@ -0,0 +1,143 @@
+from regular_grammar import FiniteAutomaton, Grammar
+import itertools
+import unittest
+
+class TestFiniteAutomatonMethods(unittest.TestCase):
+    def setUp(self):
+        self.fa = FiniteAutomaton()
+        self.grammar = Grammar()
+        # Every string over the alphabet (plus one foreign character) up to length 6
+        self.inputs = [''.join(p) for n in range(7) for p in itertools.product('abcx', repeat=n)]
+
+    def test_compiled_matches_reference(self):
+        for s in self.inputs:
+            self.assertEqual(self.fa.string_belongs_to_language(s),
+                             self.fa.string_belongs_to_language_reference(s), s)
+
+    def test_generated_strings_accepted(self):
+        for _ in range(50):
+            self.assertTrue(self.fa.string_belongs_to_language(self.grammar.generate_string()))
+
+    def test_batch_matches_single(self):
+        import numpy as np
+        expected = [self.fa.string_belongs_to_language(s) for s in self.inputs]
+        self.assertEqual(list(self.fa.strings_belong_to_language(self.inputs)), expected)
+        self.assertEqual(list(self.fa.strings_belong_to_language(['aa', 'b\na', 'baa'])), [True, False, True])
+
+        padded = np.zeros((len(self.inputs), 6), dtype=np.uint8)
+        for i, s in enumerate(self.inputs):
+            padded[i, :len(s)] = list(s.encode())
+        self.assertEqual(list(self.fa.strings_belong_to_language(padded)), expected)
+
+    def test_stream_matches_single(self):
+        for s in self.inputs:
+            expected = self.fa.string_belongs_to_language(s)
+            matcher = self.fa.matcher()
+            for i in range(0, len(s), 2):
+                matcher.feed(s[i:i + 2].encode())
+            self.assertEqual(matcher.accepted, expected, s)
+
+    def test_stream_consumed_bytes(self):
+        for chunks in (['ba', 'éa'], ['ba'.encode(), 'éa'.encode()]):
+            matcher = self.fa.matcher()
+            for chunk in chunks:
+                matcher.feed(chunk)
+            self.assertEqual(matcher.consumed, 5)
+            self.assertFalse(matcher.accepted)
+
+    def test_stream_file(self):
+        import os
+        import tempfile
+        with tempfile.NamedTemporaryFile('w', delete=False) as file:
+            file.write('b' * 100000 + 'accaba')
+        try:
+            self.assertTrue(self.fa.matcher().feed_file(file.name, chunk_size=4096))
+            with open(file.name, 'rb') as readable:
+                self.assertTrue(self.fa.matcher().feed_from(readable, chunk_size=1000))
+        finally:
+            os.remove(file.name)
+
+    def test_unit_productions(self):
+        # S -> aA | B, A -> b, B -> cB | C, C -> a
+        self.grammar.VN = {'S', 'A', 'B', 'C'}
+        self.grammar.P = {'S': ['aA', 'B'], 'A': ['b'], 'B': ['cB', 'C'], 'C': ['a']}
+        fa = self.grammar.to_finite_automaton()
+        self.assertEqual(fa.start_state, 'S')
+        self.assertEqual(fa.alphabet, {'a', 'b', 'c'})
+        cases = [('ab', True), ('a', True), ('ca', True), ('ccca', True),
+                 ('cc', False), ('b', False), ('bab', False), ('aa', False), ('abb', False), ('', False)]
+        for s, expected in cases:
+            self.assertEqual(fa.string_belongs_to_language(s), expected, s)
+            self.assertEqual(fa.string_belongs_to_language_reference(s), expected, s)
+
+    def test_single_state_transitions(self):
+        self.fa.transitions = {('S', 'a'): 'end', ('S', 'b'): 'S'}
+        self.assertTrue(self.fa.string_belongs_to_language_reference('bba'))
+        self.assertFalse(self.fa.string_belongs_to_language_reference('ab'))
+
+    def test_save_and_load(self):
+        import os
+        import tempfile
+        from compiled_dfa import CompiledDFA
+        path = os.path.join(tempfile.mkdtemp(), 'fa.dfa')
+        try:
+            for minimize in (False, True):
+                self.fa.save_compiled(path, minimize=minimize)
+                loaded = CompiledDFA.load(path)
+                self.assertEqual(loaded.minimized, minimize)
+                self.assertEqual(loaded.symbols, ['a', 'b', 'c'])
+                for s in self.inputs:
+                    self.assertEqual(loaded.accepts(s), self.fa.string_belongs_to_language(s), s)
+                self.assertEqual(list(loaded.accepts_batch(self.inputs)),
+                                 list(self.fa.strings_belong_to_language(self.inputs)))
+                self.assertEqual(list(loaded.table), list(loaded.minimize()[0].table))
+        finally:
+            os.remove(path)
+
+    def test_load_truncated(self):
+        import os
+        import tempfile
+        from compiled_dfa import CompiledDFA
+        path = os.path.join(tempfile.mkdtemp(), 'fa.dfa')
+        try:
+            self.fa.save_compiled(path)
+            with open(path, 'rb') as file:
+                data = file.read()
+            with CompiledDFA.load(path) as loaded:
+                self.assertTrue(loaded.accepts('aa'))
+            self.assertIsNone(loaded._mmap)
+            for size in (0, 10, 40, len(data) - 1):
+                with open(path, 'wb') as file:
+                    file.write(data[:size])
+                with self.assertRaises(ValueError):
+                    CompiledDFA.load(path)
+        finally:
+            os.remove(path)
+
+    def test_check_membership_cli(self):
+        import contextlib
+        import io
+        import os
+        import tempfile
+        from check_membership import main
+        directory = tempfile.mkdtemp()
+        source, output = os.path.join(directory, 'in.txt'), os.path.join(directory, 'out.txt')
+        with open(source, 'w') as file:
+            file.write('\n'.join(self.inputs) + '\n')
+        try:
+            for workers in ('1', '2'):
+                with contextlib.redirect_stderr(io.StringIO()):
+                    main([source, '--output', output, '--workers', workers, '--chunk-size', '1000'])
+                with open(output) as file:
+                    results = file.read().split()
+                self.assertEqual(results, [str(self.fa.string_belongs_to_language(s)) for s in self.inputs])
+        finally:
+            os.remove(source)
+            os.remove(output)
+
+    def test_non_ascii_rejected(self):
+        self.assertFalse(self.fa.string_belongs_to_language('aé'))
+        self.assertFalse(self.fa.string_belongs_to_language('baā'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+# Checks newline-delimited strings against a compiled automaton, in parallel.
+#
+#   python check_membership.py strings.txt --automaton fa.dfa --workers 8 > results.txt
+#   cat strings.txt | python check_membership.py
+#
+# Every output line is True or False, in the same order as the input lines.
+# The throughput report goes to stderr.
+
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from compiled_dfa import CompiledDFA
+
+_dfa = None
+
+
+def _load_automaton(path):
+    if path is None:
+        from regular_grammar import FiniteAutomaton
+        return FiniteAutomaton().compile()
+    return CompiledDFA.load(path)
+
+
+def _init_worker(path):
+    # One automaton per worker process; files are mmap-ed, so the table pages are shared
+    global _dfa
+    _dfa = _load_automaton(path)
+
+
+def _check_chunk(text):
+    # Takes a block of whole lines and returns (number of strings, output block), so that
+    # splitting and formatting happen in the workers and only two strings cross the pipe
+    lines = text.split('\n')
+    if lines[-1] == '':
+        lines.pop()
+    if '\r' in text:
+        lines = [line.rstrip('\r') for line in lines]
+    try:
+        results = _dfa.accepts_batch(lines)
+    except ImportError:
+        results = [_dfa.accepts(line) for line in lines]
+    return len(lines), ''.join('True\n' if result else 'False\n' for result in results)
+
+
+def _read_chunks(file, chunk_size):
+    # Blocks of about chunk_size characters that always end at a line boundary
+    while True:
+        block = file.read(chunk_size)
+        if not block:
+            return
+        if not block.endswith('\n'):
+            block += file.readline()
+        yield block
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check newline-delimited strings against a finite automaton.")
+    parser.add_argument('input', nargs='?', default='-', help="input file, '-' for stdin (default)")
+    parser.add_argument('--automaton', help="compiled automaton file (default: the lab 1 grammar automaton)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes, 1 runs inline")
+    parser.add_argument('--chunk-size', type=int, default=1 << 20, help="characters sent to a worker at a time")
+    parser.add_argument('--output', default='-', help="output file, '-' for stdout (default)")
+    args = parser.parse_args(argv)
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    n_strings = 0
+    n_bytes = 0
+    started = time.perf_counter()
+    try:
+        chunks = _read_chunks(source, args.chunk_size)
+        if args.workers <= 1:
+            _init_worker(args.automaton)
+            for block in chunks:
+                count, results = _check_chunk(block)
+                out.write(results)
+                n_strings += count
+                n_bytes += len(block.encode('utf-8'))
+        else:
+            with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(args.automaton,)) as pool:
+                # At most two chunks per worker in flight, so the input is never read into memory at once
+                pending = collections.deque()
+                for block in chunks:
+                    pending.append(pool.submit(_check_chunk, block))
+                    n_bytes += len(block.encode('utf-8'))
+                    if len(pending) >= 2 * args.workers:
+                        count, results = pending.popleft().result()
+                        out.write(results)
+                        n_strings += count
+                while pending:
+                    count, results = pending.popleft().result()
+                    out.write(results)
+                    n_strings += count
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if out is not sys.stdout:
+            out.close()
+
+    elapsed = max(time.perf_counter() - started, 1e-9)
+    # Sizes are UTF-8 bytes of the input lines
+    print(f"{n_strings} strings, {n_bytes / 1e6:.1f} MB in {elapsed:.2f} s: "
+          f"{n_strings / elapsed:,.0f} strings/s, {n_bytes / 1e6 / elapsed:.1f} MB/s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,378 @@
+from array import array
+import mmap
+import os
+import struct
+import sys
+
+# File layout: header, alphabet (utf-8, NUL separated), padding to 4 bytes, row offset table
+# (int32 little endian, n_states * n_symbols entries), accept bitmap (bit i of byte i // 8)
+MAGIC = b'CDFA'
+VERSION = 1
+FLAG_MINIMIZED = 1
+HEADER = struct.Struct('<4sHHIIII')  # magic, version, flags, n_states, n_symbols, start, alphabet size
+
+
+class CompiledDFA:
+    def __init__(self, symbols, table, accepting, start, subsets=None):
+        self._set_symbols(symbols)
+        self._table = table         # flat array, table[state * n_symbols + symbol_id] -> next state
+        self.accepting = accepting  # bytearray, accepting[state] == 1 for final states
+        self.start = start
+        self.n_states = len(accepting)
+        self.subsets = subsets      # state id -> frozenset of original states (if known)
+        self.minimized = False
+        self._mmap = None           # set by load
+
+        # Row offsets instead of state ids, so that one step is a single addition and lookup
+        k = self.n_symbols
+        self._jump = array('i', (next_state * k for next_state in table))
+
+    def _set_symbols(self, symbols):
+        self.symbols = list(symbols)  # symbol id -> alphabet symbol
+        self.symbol_ids = {symbol: i for i, symbol in enumerate(self.symbols)}
+        # One extra column for characters outside the alphabet, it always leads to the dead state
+        self.n_symbols = len(self.symbols) + 1
+        self.other_symbol = len(self.symbols)
+
+        # For single character ASCII alphabets the input can be mapped to symbol ids in C with bytes.translate
+        self._byte_symbols = None
+        if all(len(symbol) == 1 and ord(symbol) < 128 for symbol in self.symbols):
+            byte_symbols = bytearray([self.other_symbol]) * 256
+            for symbol, i in self.symbol_ids.items():
+                byte_symbols[ord(symbol)] = i
+            self._byte_symbols = bytes(byte_symbols)
+
+    @property
+    def table(self):
+        # A DFA loaded from a file only has the row offsets, the state id table is derived on first use
+        if self._table is None:
+            k = self.n_symbols
+            self._table = array('i', (offset // k for offset in self._jump))
+        return self._table
+
+    def save(self, path):
+        alphabet = '\0'.join(self.symbols).encode('utf-8')
+        header = HEADER.pack(MAGIC, VERSION, FLAG_MINIMIZED if self.minimized else 0,
+                             self.n_states, self.n_symbols, self.start, len(alphabet))
+        jump = array('i', self._jump)
+        if sys.byteorder != 'little':
+            jump.byteswap()
+        bitmap = bytearray((self.n_states + 7) // 8)
+        for state in range(self.n_states):
+            if self.accepting[state]:
+                bitmap[state >> 3] |= 1 << (state & 7)
+        with open(path, 'wb') as file:
+            file.write(header)
+            file.write(alphabet)
+            file.write(b'\0' * (-(HEADER.size + len(alphabet)) % 4))
+            file.write(jump.tobytes())
+            file.write(bitmap)
+
+    @classmethod
+    def load(cls, path):
+        # The row offset table stays in the page cache: it is a view of a read-only mmap, not a copy,
+        # so loading is O(states) for the accept flags only and processes share the same pages.
+        # The mapping stays open until close() (or the end of a with block).
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size < HEADER.size:
+                raise ValueError(f"{path} is not a compiled automaton file")
+            mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls._from_mapping(path, mapped)
+        except BaseException:
+            mapped.close()
+            raise
+
+    @classmethod
+    def _from_mapping(cls, path, mapped):
+        magic, version, flags, n_states, n_symbols, start, alphabet_size = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a compiled automaton file")
+        offset = HEADER.size
+        table_start = offset + alphabet_size + (-(HEADER.size + alphabet_size) % 4)
+        table_end = table_start + 4 * n_states * n_symbols
+        if len(mapped) < table_end + (n_states + 7) // 8:
+            raise ValueError(f"{path} is truncated: {len(mapped)} bytes, the header describes "
+                             f"{table_end + (n_states + 7) // 8}")
+        if start >= n_states:
+            raise ValueError(f"{path}: start state {start} out of range")
+        alphabet = mapped[offset:offset + alphabet_size].decode('utf-8')
+
+        dfa = cls.__new__(cls)
+        dfa._set_symbols(alphabet.split('\0') if alphabet_size else [])
+        if dfa.n_symbols != n_symbols:
+            raise ValueError(f"{path}: alphabet does not match the table width")
+        bitmap = mapped[table_end:table_end + (n_states + 7) // 8]
+        dfa.accepting = bytearray((bitmap[state >> 3] >> (state & 7)) & 1 for state in range(n_states))
+        if sys.byteorder != 'little':
+            dfa._jump = array('i', mapped[table_start:table_end])
+            dfa._jump.byteswap()
+        else:
+            dfa._jump = memoryview(mapped)[table_start:table_end].cast('i')
+        dfa._table = None
+        dfa.start = start
+        dfa.n_states = n_states
+        dfa.subsets = None
+        dfa.minimized = bool(flags & FLAG_MINIMIZED)
+        dfa._mmap = mapped
+        return dfa
+
+    def close(self):
+        # Unmaps a loaded file, the automaton can not be used afterwards. Does nothing for built tables.
+        if self._mmap is not None:
+            if isinstance(self._jump, memoryview):
+                self._jump.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def accepts(self, input_string):
+        jump = self._jump
+        k = self.n_symbols
+        state = self.start * k
+        if self._byte_symbols is not None:
+            # Non ASCII characters become bytes >= 0x80, which are mapped to the "other" column
+            for symbol_id in input_string.encode('utf-8').translate(self._byte_symbols):
+                state = jump[state + symbol_id]
+        else:
+            symbol_ids = self.symbol_ids
+            other = self.other_symbol
+            for char in input_string:
+                state = jump[state + symbol_ids.get(char, other)]
+        return self.accepting[state // k] == 1
+
+    def accepts_batch(self, strings, pad=0, chunk_size=1 << 22):
+        # strings is a list of str or a 2D uint8 array (one string per row, right padded with `pad`).
+        # Every string is stepped through the table at once, one NumPy gather per input column.
+        import numpy as np
+
+        if len(strings) == 0:
+            return np.zeros(0, dtype=bool)
+        if self._byte_symbols is None:
+            return np.fromiter((self.accepts(s) for s in strings), dtype=bool, count=len(strings))
+
+        k = self.n_symbols
+        pad_symbol = k  # extra column that leaves the state unchanged
+        jump = np.empty((self.n_states, k + 1), dtype=np.intp)
+        jump[:, :k] = np.frombuffer(self._jump, dtype=np.int32).reshape(self.n_states, k) // k
+        jump[:, k] = np.arange(self.n_states)
+        jump = (jump * (k + 1)).ravel()
+        accepting = np.frombuffer(bytes(self.accepting), dtype=np.uint8).astype(bool)
+        start = self.start * (k + 1)
+
+        if isinstance(strings, np.ndarray):
+            lut = np.frombuffer(self._byte_symbols, dtype=np.uint8).copy()
+            lut[pad] = pad_symbol
+            symbols = lut[strings.T]  # column major, symbols[j] is the j-th character of every string
+            states = np.full(strings.shape[0], start, dtype=np.intp)
+            for column in symbols:
+                states = jump.take(states + column)
+            return accepting[states // (k + 1)]
+
+        # Encode everything in one call, the newlines give the string boundaries
+        encoded = '\n'.join(strings).encode('utf-8')
+        separators = np.flatnonzero(np.frombuffer(encoded, dtype=np.uint8) == ord('\n'))
+        if len(separators) != len(strings) - 1:
+            # Some strings contain newlines themselves, encode them one by one
+            parts = [s.encode('utf-8') for s in strings]
+            encoded = b''.join(parts)
+            lengths = np.fromiter(map(len, parts), dtype=np.intp, count=len(parts))
+            offsets = np.zeros(len(parts), dtype=np.intp)
+            np.cumsum(lengths[:-1], out=offsets[1:])
+        else:
+            offsets = np.concatenate(([0], separators + 1))
+            lengths = np.concatenate((separators, [len(encoded)])) - offsets
+        # Flat symbol ids for all strings, the last element is a padding symbol
+        flat = np.frombuffer(encoded.translate(self._byte_symbols) + bytes([pad_symbol]), dtype=np.uint8)
+
+        # Strings of similar length go into the same chunk so that little padding is stepped through
+        # Small integer keys let the stable sort use radix sort
+        order = np.argsort(lengths.astype(np.uint16) if lengths.max() < 1 << 16 else lengths, kind='stable')
+        sorted_lengths = np.maximum(lengths[order], 1)
+        result = np.empty(len(strings), dtype=bool)
+        begin = 0
+        while begin < len(order):
+            # Largest chunk whose padded size (rows * longest row) stays within chunk_size
+            low, high = begin + 1, len(order)
+            while low < high:
+                middle = (low + high + 1) // 2
+                if (middle - begin) * sorted_lengths[middle - 1] <= chunk_size:
+                    low = middle
+                else:
+                    high = middle - 1
+            end = low
+            rows = order[begin:end]
+            max_len = int(lengths[rows[-1]])
+            positions = np.arange(max_len, dtype=np.intp)[:, None]
+            index = offsets[rows][None, :] + positions
+            index[positions >= lengths[rows][None, :]] = len(flat) - 1
+            states = np.full(len(rows), start, dtype=np.intp)
+            for column in flat[index]:
+                states = jump.take(states + column)
+            result[rows] = accepting[states // (k + 1)]
+            begin = end
+        return result
+
+    def minimize(self):
+        # Returns (minimal dfa, groups), groups[new state] lists the original state ids merged into it
+        return minimize_dfa(self)
+
+    def __str__(self):
+        rows = []
+        for state in range(self.n_states):
+            row = self.table[state * self.n_symbols:state * self.n_symbols + len(self.symbols)]
+            marker = '*' if self.accepting[state] else ' '
+            rows.append(f"{marker}{state}: " + ', '.join(f"{s}->{t}" for s, t in zip(self.symbols, row)))
+        return f"Start state: {self.start}\n" + "\n".join(rows)
+
+
+def transition_targets(next_states):
+    # NFA transitions map to sets of states, DFA transitions (nfa_to_dfa) map to a single state
+    if isinstance(next_states, (set, frozenset)):
+        return next_states
+    return (next_states,)
+
+
+def epsilon_closures(fa):
+    # closures[state] = states reachable through '' transitions, including the state itself.
+    # Only states with epsilon transitions are listed, every other state is its own closure.
+    epsilon = {}
+    for (state, symbol), next_states in fa.transitions.items():
+        if symbol == '':
+            epsilon.setdefault(state, set()).update(transition_targets(next_states))
+    closures = {}
+    for state in epsilon:
+        closure = {state}
+        stack = [state]
+        while stack:
+            for next_state in epsilon.get(stack.pop(), ()):
+                if next_state not in closure:
+                    closure.add(next_state)
+                    stack.append(next_state)
+        closures[state] = frozenset(closure)
+    return closures
+
+
+def close(closures, states):
+    result = set()
+    for state in states:
+        result.update(closures.get(state, (state,)))
+    return frozenset(result)
+
+
+def compile_automaton(fa):
+    # Subset construction straight into integer ids, state 0 is the dead (empty) state
+    symbols = sorted(({symbol for (_, symbol) in fa.transitions} | set(fa.alphabet)) - {''})
+
+    # Epsilon closures are folded into the moves once, so the construction never follows '' edges
+    closures = epsilon_closures(fa)
+    moves = {}
+    for (state, symbol), next_states in fa.transitions.items():
+        if symbol != '':
+            moves[(state, symbol)] = close(closures, transition_targets(next_states))
+
+    dead = frozenset()
+    start = close(closures, [fa.start_state])
+    subsets = [dead, start]
+    ids = {dead: 0, start: 1}
+    table = array('i')
+    accepting = bytearray()
+
+    state_id = 0
+    while state_id < len(subsets):
+        subset = subsets[state_id]
+        accepting.append(1 if any(state in fa.accept_states for state in subset) else 0)
+        for symbol in symbols:
+            next_subset = set()
+            for state in subset:
+                next_subset.update(moves.get((state, symbol), ()))
+            next_subset = frozenset(next_subset)
+            if next_subset not in ids:
+                ids[next_subset] = len(subsets)
+                subsets.append(next_subset)
+            table.append(ids[next_subset])
+        table.append(0)  # characters outside the alphabet
+        state_id += 1
+
+    return CompiledDFA(symbols, table, accepting, 1, subsets)
+
+
+def minimize_dfa(dfa):
+    # Hopcroft partition refinement, O(n * k * log n). Returns the minimal DFA and, for every new
+    # state, the list of original state ids merged into it.
+    n, k = dfa.n_states, dfa.n_symbols
+    table = dfa.table
+
+    # inverse[c][t] = states that move to t with symbol id c
+    inverse = [[[] for _ in range(n)] for _ in range(k)]
+    for state in range(n):
+        base = state * k
+        for c in range(k):
+            inverse[c][table[base + c]].append(state)
+
+    accepting = {state for state in range(n) if dfa.accepting[state]}
+    rejecting = set(range(n)) - accepting
+    blocks = [block for block in (accepting, rejecting) if block]
+    block_of = [0] * n
+    for i, block in enumerate(blocks):
+        for state in block:
+            block_of[state] = i
+    # Both halves of the first split do not need to be splitters, the smaller one is enough
+    waiting = {min(range(len(blocks)), key=lambda i: len(blocks[i]))}
+
+    while waiting:
+        splitter = list(blocks[waiting.pop()])
+        for c in range(k):
+            inv = inverse[c]
+            touched = {}
+            for target in splitter:
+                for state in inv[target]:
+                    touched.setdefault(block_of[state], []).append(state)
+            for b, members in touched.items():
+                block = blocks[b]
+                if len(members) == len(block):
+                    continue
+                # The smaller half gets the new block id, so each state is relabelled O(log n) times
+                if 2 * len(members) <= len(block):
+                    moved = set(members)
+                else:
+                    moved = block.difference(members)
+                block -= moved
+                new = len(blocks)
+                blocks.append(moved)
+                for state in moved:
+                    block_of[state] = new
+                # If b is still waiting both halves are covered, otherwise the smaller one is enough
+                waiting.add(new)
+
+    # Renumber: the dead state stays 0, the rest in breadth first order from the start state
+    order = {block_of[0]: 0}
+    queue = [block_of[dfa.start]]
+    for b in queue:
+        if b in order:
+            continue
+        order[b] = len(order)
+        representative = next(iter(blocks[b]))
+        for c in range(k):
+            next_block = block_of[table[representative * k + c]]
+            if next_block not in order:
+                queue.append(next_block)
+
+    groups = [None] * len(order)
+    for b, new in order.items():
+        groups[new] = sorted(blocks[b])
+    new_table = array('i')
+    new_accepting = bytearray()
+    for members in groups:
+        representative = members[0]
+        new_accepting.append(dfa.accepting[representative])
+        for c in range(k):
+            new_table.append(order[block_of[table[representative * k + c]]])
+    minimal = CompiledDFA(dfa.symbols, new_table, new_accepting, order[block_of[dfa.start]])
+    minimal.minimized = True
+    return minimal, groups
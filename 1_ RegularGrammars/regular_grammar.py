@@ -13,6 +13,9 @@
 
 import random
 
+from compiled_dfa import close, compile_automaton, epsilon_closures, transition_targets
+from stream_matcher import StreamMatcher
+
 class FiniteAutomaton:
     def __init__(self):
         self.states = {'S', 'F', 'D', 'end'}
@@ -28,14 +31,49 @@ class FiniteAutomaton:
         }
         self.start_state = 'S'
         self.accept_states = {'end'}
+        self.compiled = None
+
+    def compile(self):
+        # Integer state ids and a flat transition table, call again after changing the transitions
+        self.compiled = compile_automaton(self)
+        return self.compiled
 
     def string_belongs_to_language(self, input_string):
-        current_states = {self.start_state}
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.accepts(input_string)
+
+    def save_compiled(self, path, minimize=False):
+        # Binary table that CompiledDFA.load maps straight from disk, without rebuilding the automaton
+        compiled = self.compiled if self.compiled is not None else self.compile()
+        if minimize:
+            compiled, _ = compiled.minimize()
+        compiled.save(path)
+
+    def strings_belong_to_language(self, strings):
+        # Batch version, takes a list of strings or a padded uint8 array and returns a boolean array
+        if self.compiled is None:
+            self.compile()
+        return self.compiled.accepts_batch(strings)
+
+    def matcher(self):
+        # Resumable matcher for input that arrives in chunks (files, sockets, memory-mapped logs)
+        if self.compiled is None:
+            self.compile()
+        return StreamMatcher(self.compiled)
+
+    def string_belongs_to_language_reference(self, input_string):
+        # Set based simulation, kept to check the compiled matcher against.
+        # Epsilon closures are computed once per call and folded into the moves.
+        closures = epsilon_closures(self)
+        moves = {key: close(closures, transition_targets(next_states))
+                 for key, next_states in self.transitions.items() if key[1] != ''}
+        current_states = close(closures, [self.start_state])
         for char in input_string:
             next_states = set()
             for state in current_states:
-                if (state, char) in self.transitions:
-                    next_states.update(self.transitions[(state, char)])
+                if (state, char) in moves:
+                    next_states.update(moves[(state, char)])
             current_states = next_states
         return len(current_states.intersection(self.accept_states)) > 0
 
@@ -62,36 +100,44 @@ class Grammar:
         return expand(self.S)
 
     def to_finite_automaton(self):
+        # Starts from an empty automaton, the preloaded variant transitions are not part of the grammar
         fa = FiniteAutomaton()
+        fa.states = set(self.VN) | {'end'}
+        fa.alphabet = set(self.VT)
+        fa.transitions = {}
+        fa.start_state = self.S
+        fa.accept_states = {'end'}
         for non_terminal, productions in self.P.items():
             for production in productions:
                 if len(production) == 2:  # Assuming productions like A -> aB
                     input_char = production[0]
                     next_state = production[1]
-                    fa.transitions[(non_terminal, input_char)] = {next_state}
+                    fa.transitions.setdefault((non_terminal, input_char), set()).add(next_state)
                 elif len(production) == 1:  # Assuming productions like A -> a or A -> B
                     input_char = production
                     # Assuming 'end' state for terminal transitions
                     if input_char in self.VT:
-                        fa.transitions[(non_terminal, input_char)] = {'end'}
+                        fa.transitions.setdefault((non_terminal, input_char), set()).add('end')
                     else:
-                        fa.transitions[(non_terminal, '')] = {input_char}
+                        # Unit production A -> B, an epsilon transition
+                        fa.transitions.setdefault((non_terminal, ''), set()).add(input_char)
         return fa
 
-grammar = Grammar()
-fa = grammar.to_finite_automaton()
-print("Generated strings from the grammar:")
-for _ in range(5):
-    print(grammar.generate_string())
+if __name__ == "__main__":
+    grammar = Grammar()
+    fa = grammar.to_finite_automaton()
+    print("Generated strings from the grammar:")
+    for _ in range(5):
+        print(grammar.generate_string())
 
 
-print("\n")
-print("Finite Automaton Transitions from CFG:")
-for (state, input_char), next_states in fa.transitions.items():
-    print(f"Transition: ({state}, '{input_char}') -> {next_states}")
+    print("\n")
+    print("Finite Automaton Transitions from CFG:")
+    for (state, input_char), next_states in fa.transitions.items():
+        print(f"Transition: ({state}, '{input_char}') -> {next_states}")
 
 
-fa = FiniteAutomaton()
-user_input = input("\nEnter a string to check: ")
-result = fa.string_belongs_to_language(user_input)
-print(f"Does '{user_input}' belong to the language? {result}")
+    fa = FiniteAutomaton()
+    user_input = input("\nEnter a string to check: ")
+    result = fa.string_belongs_to_language(user_input)
+    print(f"Does '{user_input}' belong to the language? {result}")
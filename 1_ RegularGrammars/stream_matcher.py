@@ -0,0 +1,82 @@
+import codecs
+import mmap
+import os
+
+
+class StreamMatcher:
+    def __init__(self, dfa, encoding='utf-8'):
+        self.dfa = dfa
+        self.encoding = encoding
+        self.reset()
+
+    def reset(self):
+        # The whole state of the matcher is one compiled state id (a set of original states)
+        self.state = self.dfa.start
+        self.consumed = 0  # input bytes fed so far, str chunks are counted in self.encoding
+        self._decoder = codecs.getincrementaldecoder(self.encoding)()
+
+    @property
+    def current_states(self):
+        if self.dfa.subsets is None:
+            return None
+        return self.dfa.subsets[self.state]
+
+    @property
+    def accepted(self):
+        return self.dfa.accepting[self.state] == 1
+
+    def feed(self, chunk):
+        # Chunks may be str or bytes, a multi byte character may be split between two chunks
+        text = None
+        if isinstance(chunk, str):
+            # Counted by their encoded size, so consumed is in bytes for either kind of chunk
+            text = chunk
+            chunk = text.encode(self.encoding, 'replace')
+        self.consumed += len(chunk)
+        if self.state == 0:
+            return self  # the dead state is a sink, the rest of the input cannot change the answer
+
+        dfa = self.dfa
+        jump = dfa._jump
+        k = dfa.n_symbols
+        state = self.state * k
+        if dfa._byte_symbols is None or self.encoding not in ('utf-8', 'ascii'):
+            self._feed_text(self._decoder.decode(chunk) if text is None else text, state)
+            return self
+        if text is not None and self.encoding == 'ascii':
+            chunk = text.encode('utf-8')  # 'replace' may have turned a character into a symbol
+
+        # ASCII alphabet: every byte outside it (including parts of multi byte characters) leads to the dead state
+        for symbol_id in bytes(chunk).translate(dfa._byte_symbols):
+            state = jump[state + symbol_id]
+        self.state = state // k
+        return self
+
+    def _feed_text(self, text, state):
+        jump = self.dfa._jump
+        symbol_ids = self.dfa.symbol_ids
+        other = self.dfa.other_symbol
+        for char in text:
+            state = jump[state + symbol_ids.get(char, other)]
+        self.state = state // self.dfa.n_symbols
+
+    def feed_from(self, readable, chunk_size=1 << 20):
+        # Works with open files, sys.stdin.buffer or socket.makefile('rb')
+        while self.state != 0:
+            chunk = readable.read(chunk_size)
+            if not chunk:
+                break
+            self.feed(chunk)
+        return self.accepted
+
+    def feed_file(self, path, chunk_size=1 << 20):
+        # The file is memory-mapped and walked in fixed size windows, so memory use does not depend on its size
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return self.accepted
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for start in range(0, len(mapped), chunk_size):
+                    if self.state == 0:
+                        break
+                    self.feed(mapped[start:start + chunk_size])
+        return self.accepted
@@ -11,7 +11,14 @@
 #     F → a
 # }
 
+import os
 import random
+import sys
+
+LAB_1 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '1_ RegularGrammars')
+if LAB_1 not in sys.path:
+    sys.path.append(LAB_1)
+from compiled_dfa import close, epsilon_closures, transition_targets
 
 class FiniteAutomaton:
     def __init__(self):
@@ -28,14 +35,24 @@ class FiniteAutomaton:
         }
         self.start_state = 'S'
         self.accept_states = {'end'}
+        self.closed = None
+
+    def close_epsilon(self):
+        # Epsilon closures folded into the moves (and the start set), call again after changing the transitions
+        closures = epsilon_closures(self)
+        moves = {key: close(closures, transition_targets(next_states))
+                 for key, next_states in self.transitions.items() if key[1] != ''}
+        self.closed = close(closures, [self.start_state]), moves
+        return self.closed
 
     def string_belongs_to_language(self, input_string):
-        current_states = {self.start_state}
+        # No '' edges are followed per character, the closures are computed once per automaton
+        current_states, moves = self.closed if self.closed is not None else self.close_epsilon()
         for char in input_string:
             next_states = set()
             for state in current_states:
-                if (state, char) in self.transitions:
-                    next_states.update(self.transitions[(state, char)])
+                if (state, char) in moves:
+                    next_states.update(moves[(state, char)])
             current_states = next_states
         return len(current_states.intersection(self.accept_states)) > 0
 
@@ -93,39 +110,47 @@ class Grammar:
         return expand(self.S)
 
     def to_finite_automaton(self):
+        # Starts from an empty automaton, the preloaded variant transitions are not part of the grammar
         fa = FiniteAutomaton()
+        fa.states = set(self.VN) | {'end'}
+        fa.alphabet = set(self.VT)
+        fa.transitions = {}
+        fa.start_state = self.S
+        fa.accept_states = {'end'}
         for non_terminal, productions in self.P.items():
             for production in productions:
                 if len(production) == 2:  # Assuming productions like A -> aB
                     input_char = production[0]
                     next_state = production[1]
-                    fa.transitions[(non_terminal, input_char)] = {next_state}
+                    fa.transitions.setdefault((non_terminal, input_char), set()).add(next_state)
                 elif len(production) == 1:  # Assuming productions like A -> a or A -> B
                     input_char = production
                     # Assuming 'end' state for terminal transitions
                     if input_char in self.VT:
-                        fa.transitions[(non_terminal, input_char)] = {'end'}
+                        fa.transitions.setdefault((non_terminal, input_char), set()).add('end')
                     else:
-                        fa.transitions[(non_terminal, '')] = {input_char}
+                        # Unit production A -> B, an epsilon transition
+                        fa.transitions.setdefault((non_terminal, ''), set()).add(input_char)
         return fa
 
 
-grammar = Grammar()
-fa = grammar.to_finite_automaton()
-print("Generated strings from the grammar:")
-for _ in range(5):
-    print(grammar.generate_string())
+if __name__ == "__main__":
+    grammar = Grammar()
+    fa = grammar.to_finite_automaton()
+    print("Generated strings from the grammar:")
+    for _ in range(5):
+        print(grammar.generate_string())
 
 
-print("\n")
-print("Finite Automaton Transitions from CFG:")
-for (state, input_char), next_states in fa.transitions.items():
-    print(f"Transition: ({state}, '{input_char}') -> {next_states}")
+    print("\n")
+    print("Finite Automaton Transitions from CFG:")
+    for (state, input_char), next_states in fa.transitions.items():
+        print(f"Transition: ({state}, '{input_char}') -> {next_states}")
 
 
-fa = FiniteAutomaton()
-user_input = input("\nEnter a string to check: ")
-result = fa.string_belongs_to_language(user_input)
-print(f"Does '{user_input}' belong to the language? {result}")
-grammar = Grammar()
-print("Chomsky Classification:", grammar.chomsky_classification())
\ No newline at end of file
+    fa = FiniteAutomaton()
+    user_input = input("\nEnter a string to check: ")
+    result = fa.string_belongs_to_language(user_input)
+    print(f"Does '{user_input}' belong to the language? {result}")
+    grammar = Grammar()
+    print("Chomsky Classification:", grammar.chomsky_classification())
@@ -10,8 +10,16 @@
 # δ(q3,a) = q3,
 # δ(q2,a) = q3
 
-import matplotlib.pyplot as plt
-import networkx as nx
+import os
+import sys
+
+# The lab 1 modules (compiled_dfa) are shared by this module and the backends it imports
+LAB_1 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '1_ RegularGrammars')
+if LAB_1 not in sys.path:
+    sys.path.append(LAB_1)
+from compiled_dfa import close, compile_automaton, epsilon_closures, transition_targets
+from bitset_nfa import BitsetNFA
+from lazy_dfa import LazyDFA
 
 class FiniteAutomaton:
     def __init__(self):
@@ -27,15 +35,68 @@ class FiniteAutomaton:
         }
         self.start_state = 'q0'
         self.accept_states = {'q2'}
-        pass
+        self.bitset = None
+        self.lazy = None
+        self.closed = None
+
+    def to_bitset(self):
+        # Int bitmask engine, call again after changing the transitions
+        self.bitset = BitsetNFA(self)
+        self.lazy = None
+        return self.bitset
+
+    def lazy_dfa(self, cache_size=1024):
+        # DFA that is determinized on the fly while matching, with at most cache_size states kept
+        self.lazy = LazyDFA(self.bitset if self.bitset is not None else self.to_bitset(), cache_size)
+        return self.lazy
+
+    def close_epsilon(self):
+        # Epsilon closures are computed once and folded into the moves (and the start set),
+        # so neither the simulation nor the subset construction follows '' edges.
+        # Call again after changing the transitions.
+        closures = epsilon_closures(self)
+        moves = {key: close(closures, transition_targets(next_states))
+                 for key, next_states in self.transitions.items() if key[1] != ''}
+        self.closed = close(closures, [self.start_state]), moves
+        return self.closed
+
+    def string_belongs_to_language(self, input_string, backend='sets'):
+        if backend == 'bitset':
+            if self.bitset is None:
+                self.to_bitset()
+            return self.bitset.accepts(input_string)
+        if backend == 'lazy':
+            if self.lazy is None:
+                self.lazy_dfa()
+            return self.lazy.accepts(input_string)
+        if backend != 'sets':
+            raise ValueError(f"Unknown backend: {backend}")
+
+        current_states, moves = self.closed if self.closed is not None else self.close_epsilon()
+        for char in input_string:
+            next_states = set()
+            for state in current_states:
+                if (state, char) in moves:
+                    next_states.update(moves[(state, char)])
+            current_states = next_states
+        return len(current_states.intersection(self.accept_states)) > 0
+
+    def nfa_to_dfa(self, backend='sets'):
+        if backend == 'bitset':
+            return self._nfa_to_dfa_bitset()
+        if backend != 'sets':
+            raise ValueError(f"Unknown backend: {backend}")
+
+        start_states, moves = self.closed if self.closed is not None else self.close_epsilon()
 
-    def nfa_to_dfa(self):
         dfa = FiniteAutomaton()
-        dfa.alphabet = self.alphabet
-        dfa.start_state = (self.start_state,)  # Start state represented as a tuple
+        dfa.alphabet = self.alphabet - {''}
+        dfa.start_state = tuple(sorted(start_states))  # Start state represented as a tuple
         dfa.states = {dfa.start_state}
         dfa.transitions = {}
         dfa.accept_states = set()
+        if any(state in self.accept_states for state in dfa.start_state):
+            dfa.accept_states.add(dfa.start_state)
 
         unprocessed_states = [dfa.start_state]
 
@@ -45,7 +106,7 @@ class FiniteAutomaton:
             for symbol in dfa.alphabet:
                 next_states = set()
                 for state in current_state:
-                    next_states |= self.transitions.get((state, symbol), set())
+                    next_states |= moves.get((state, symbol), set())
 
                 if next_states:
                     next_state = tuple(sorted(next_states))  # Convert set to tuple, sort for consistency
@@ -58,12 +119,84 @@ class FiniteAutomaton:
 
         return dfa
 
+    def _nfa_to_dfa_bitset(self):
+        # Same result as the set based construction, but every subset is an int mask while it is built
+        nfa = self.bitset if self.bitset is not None else self.to_bitset()
+        names = {}
+
+        def name(mask):
+            if mask not in names:
+                names[mask] = tuple(sorted(nfa.states_of(mask)))
+            return names[mask]
+
+        dfa = FiniteAutomaton()
+        dfa.alphabet = self.alphabet - {''}
+        dfa.start_state = name(nfa.start_mask)
+        dfa.transitions = {}
+        dfa.accept_states = set()
+        for mask, row in nfa.determinize().items():
+            if mask & nfa.accept_mask:
+                dfa.accept_states.add(name(mask))
+            for symbol, next_mask in row.items():
+                dfa.transitions[name(mask), symbol] = name(next_mask)
+        dfa.states = set(names.values())
+        return dfa
+
+    def minimize(self):
+        # Hopcroft minimization on the compiled integer tables. For a DFA (the output of nfa_to_dfa)
+        # every class of equivalent states is named after its first member, mapping[name] lists the
+        # original states merged into it. An NFA is determinized first and its subsets can overlap
+        # between classes, so there a class is named by the tuple of its subsets (each one sorted,
+        # as in nfa_to_dfa). States that can never reach a final state are dropped.
+        compiled = compile_automaton(self)
+        minimal, groups = compiled.minimize()
+        deterministic = all(len(subset) <= 1 for subset in compiled.subsets)
+
+        names = {}
+        mapping = {}
+        for new, members in enumerate(groups):
+            if deterministic:
+                originals = sorted({state for i in members for state in compiled.subsets[i]}, key=str)
+                name = originals[0] if originals else None
+            else:
+                originals = sorted({tuple(sorted(compiled.subsets[i], key=str)) for i in members
+                                    if compiled.subsets[i]}, key=str)
+                name = tuple(originals)
+            if originals and (new != 0 or new == minimal.start):
+                names[new] = name
+                mapping[name] = originals
+
+        dfa = FiniteAutomaton()
+        dfa.alphabet = self.alphabet
+        dfa.start_state = names.get(minimal.start, self.start_state)
+        dfa.states = set(names.values()) | {dfa.start_state}
+        dfa.accept_states = {names[new] for new in names if minimal.accepting[new]}
+        dfa.transitions = {}
+        k = minimal.n_symbols
+        for new, name in names.items():
+            for symbol_id, symbol in enumerate(minimal.symbols):
+                target = minimal.table[new * k + symbol_id]
+                if target in names and target != 0:
+                    dfa.transitions[name, symbol] = names[target]
+        return dfa, mapping
+
+    def save_compiled(self, path, minimize=False):
+        # Compiled (and optionally minimized) table for CompiledDFA.load, so workers skip nfa_to_dfa at startup
+        compiled = compile_automaton(self)
+        if minimize:
+            compiled, _ = compiled.minimize()
+        compiled.save(path)
+
     def __str__(self):
         transitions_str = "\n".join([f"{state} --{symbol}--> {next_state}" for (state, symbol), next_state in self.transitions.items()])
         accept_states_str = ", ".join(str(state) for state in self.accept_states)
         return f"States: {', '.join(map(str, self.states))}\nAlphabet: {', '.join(self.alphabet)}\nTransitions:\n{transitions_str}\nStart state: {self.start_state}\nFinal states: {accept_states_str}"
 
     def visualize(self):
+        # Plotting is only needed here, so importing the module does not load matplotlib and networkx
+        import matplotlib.pyplot as plt
+        import networkx as nx
+
         G = nx.DiGraph()
 
         # Add states
@@ -112,9 +245,10 @@ class FiniteAutomaton:
         plt.show()
 
 
-# Usage:
-nfa = FiniteAutomaton()  # Define your NFA
-dfa = nfa.nfa_to_dfa()  # Convert NFA to DFA
-dfa.visualize()  # Visualize the NFA graphically
-print("Deterministic Finite Automaton converted from Non-Deterministic Finite Automaton:")
-print(dfa)
+if __name__ == "__main__":
+    # Usage:
+    nfa = FiniteAutomaton()  # Define your NFA
+    dfa = nfa.nfa_to_dfa()  # Convert NFA to DFA
+    dfa.visualize()  # Visualize the NFA graphically
+    print("Deterministic Finite Automaton converted from Non-Deterministic Finite Automaton:")
+    print(dfa)
@@ -0,0 +1,125 @@
+import importlib
+import itertools
+import unittest
+
+conversion = importlib.import_module('3_Conversion')
+hierarchy = importlib.import_module('1_ChomskyHierarchy')
+
+class TestFiniteAutomatonMethods(unittest.TestCase):
+    def setUp(self):
+        self.nfa = conversion.FiniteAutomaton()
+        self.inputs = [''.join(p) for n in range(8) for p in itertools.product('abc', repeat=n)]
+
+    def test_bitset_membership(self):
+        for s in self.inputs:
+            self.assertEqual(self.nfa.string_belongs_to_language(s, backend='bitset'),
+                             self.nfa.string_belongs_to_language(s), s)
+
+    def test_lazy_membership(self):
+        lazy = self.nfa.lazy_dfa(cache_size=2)
+        for s in self.inputs:
+            self.assertEqual(self.nfa.string_belongs_to_language(s, backend='lazy'),
+                             self.nfa.string_belongs_to_language(s), s)
+        stats = lazy.stats()
+        self.assertLessEqual(stats['states'], 2)
+        self.assertGreater(stats['hits'], 0)
+        self.assertGreater(stats['evictions'], 0)
+        self.assertTrue(self.nfa.string_belongs_to_language('b' * 5 + 'a' + 'c' * 3000 + 'a', backend='lazy'))
+
+        lazy = self.nfa.lazy_dfa(cache_size=0)
+        for s in self.inputs[:200]:
+            self.assertEqual(lazy.accepts(s), self.nfa.string_belongs_to_language(s), s)
+        self.assertEqual(lazy.stats()['states'], 0)
+        with self.assertRaises(ValueError):
+            self.nfa.lazy_dfa(cache_size=-1)
+
+    def test_bitset_nfa_to_dfa(self):
+        dfa = self.nfa.nfa_to_dfa()
+        bitset_dfa = self.nfa.nfa_to_dfa(backend='bitset')
+        self.assertEqual(bitset_dfa.states, dfa.states)
+        self.assertEqual(bitset_dfa.transitions, dfa.transitions)
+        self.assertEqual(bitset_dfa.accept_states, dfa.accept_states)
+        self.assertEqual(bitset_dfa.start_state, dfa.start_state)
+
+    def test_epsilon_transitions(self):
+        nfa = conversion.FiniteAutomaton()
+        nfa.states = {'s', 'x', 'y', 'f'}
+        nfa.alphabet = {'a', 'b'}
+        nfa.transitions = {('s', ''): {'x'}, ('x', 'a'): {'x', 'y'}, ('y', ''): {'f'}, ('f', 'b'): {'s'}}
+        nfa.start_state = 's'
+        nfa.accept_states = {'f'}
+        cases = [('a', True), ('aa', True), ('ab', False), ('aba', True), ('', False), ('b', False)]
+        for backend in ('sets', 'bitset', 'lazy'):
+            for s, expected in cases:
+                self.assertEqual(nfa.string_belongs_to_language(s, backend=backend), expected, (backend, s))
+        dfa = nfa.nfa_to_dfa()
+        self.assertEqual(dfa.start_state, ('s', 'x'))
+        self.assertEqual(nfa.nfa_to_dfa(backend='bitset').transitions, dfa.transitions)
+        for s, expected in cases:
+            self.assertEqual(dfa.string_belongs_to_language(s), expected, s)
+
+    def test_minimize(self):
+        dfa = self.nfa.nfa_to_dfa()
+        minimal, mapping = dfa.minimize()
+        self.assertLessEqual(len(minimal.states), len(dfa.states))
+        self.assertEqual(sorted(s for members in mapping.values() for s in members),
+                         sorted(dfa.states))
+        for s in self.inputs:
+            self.assertEqual(minimal.string_belongs_to_language(s, backend='bitset'),
+                             self.nfa.string_belongs_to_language(s), s)
+
+    def test_minimize_nfa(self):
+        minimal, mapping = self.nfa.minimize()
+        self.assertEqual(len(mapping), len(minimal.states))
+        self.assertEqual(mapping[minimal.start_state], [('q0',)])
+        for s in self.inputs:
+            self.assertEqual(minimal.string_belongs_to_language(s),
+                             self.nfa.string_belongs_to_language(s), s)
+
+    def test_save_compiled(self):
+        import os
+        import tempfile
+        from compiled_dfa import CompiledDFA
+        path = os.path.join(tempfile.mkdtemp(), 'nfa.dfa')
+        try:
+            self.nfa.save_compiled(path, minimize=True)
+            loaded = CompiledDFA.load(path)
+            self.assertTrue(loaded.minimized)
+            for s in self.inputs:
+                self.assertEqual(loaded.accepts(s), self.nfa.string_belongs_to_language(s), s)
+        finally:
+            os.remove(path)
+
+    def test_minimize_merges_equivalent_states(self):
+        dfa = conversion.FiniteAutomaton()
+        dfa.states = {'A', 'B', 'C', 'D'}
+        dfa.alphabet = {'a', 'b'}
+        dfa.transitions = {('A', 'a'): 'B', ('A', 'b'): 'C', ('B', 'a'): 'D', ('C', 'a'): 'D', ('D', 'b'): 'D'}
+        dfa.start_state = 'A'
+        dfa.accept_states = {'D'}
+        minimal, mapping = dfa.minimize()
+        self.assertEqual(len(minimal.states), 3)
+        self.assertEqual(mapping['B'], ['B', 'C'])
+        self.assertEqual(minimal.transitions[('A', 'b')], 'B')
+
+class TestChomskyHierarchyMethods(unittest.TestCase):
+    def test_unit_productions(self):
+        # S -> aA | B, A -> b, B -> cB | C, C -> a
+        grammar = hierarchy.Grammar()
+        grammar.VN = {'S', 'A', 'B', 'C'}
+        grammar.P = {'S': ['aA', 'B'], 'A': ['b'], 'B': ['cB', 'C'], 'C': ['a']}
+        fa = grammar.to_finite_automaton()
+        cases = [('ab', True), ('a', True), ('ca', True), ('ccca', True),
+                 ('cc', False), ('b', False), ('bab', False), ('aa', False), ('abb', False), ('', False)]
+        for s, expected in cases:
+            self.assertEqual(fa.string_belongs_to_language(s), expected, s)
+        self.assertIsNotNone(fa.closed)
+
+    def test_single_state_transitions(self):
+        fa = hierarchy.FiniteAutomaton()
+        fa.transitions = {('S', 'a'): 'end', ('S', 'b'): 'S'}
+        self.assertTrue(fa.string_belongs_to_language('bba'))
+        self.assertFalse(fa.string_belongs_to_language('ab'))
+
+if __name__ == '__main__':
+    unittest.main()
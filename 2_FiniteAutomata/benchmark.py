@@ -0,0 +1,163 @@
+# Benchmarks for automaton construction and matching on synthetic NFAs.
+#
+#   python benchmark.py --states 8 16 32 --alphabet 2 4 --degree 1 2 --output bench.json
+#   python benchmark.py --output new.json --compare bench.json
+#
+# Every case is generated from the seed, so two runs measure the same automata and inputs.
+# Results are written as JSON; with --compare, cases that got slower than --tolerance are listed
+# and the exit status is 1.
+
+import argparse
+import gc
+import importlib
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+conversion = importlib.import_module('3_Conversion')
+compile_automaton = conversion.compile_automaton
+
+
+def generate_nfa(n_states, alphabet_size, degree, seed, accept_ratio=0.1):
+    # Every (state, symbol) pair gets `degree` random targets, degree 1 gives a DFA
+    rng = random.Random(seed)
+    nfa = conversion.FiniteAutomaton()
+    nfa.states = {f'q{i}' for i in range(n_states)}
+    nfa.alphabet = {chr(ord('a') + i) for i in range(alphabet_size)}
+    nfa.transitions = {}
+    for i, symbol in itertools.product(range(n_states), sorted(nfa.alphabet)):
+        nfa.transitions[(f'q{i}', symbol)] = {f'q{rng.randrange(n_states)}' for _ in range(degree)}
+    nfa.start_state = 'q0'
+    nfa.accept_states = {f'q{i}' for i in range(n_states) if rng.random() < accept_ratio} or {f'q{n_states - 1}'}
+    return nfa
+
+
+def timed(function, repeat):
+    # Best of `repeat` runs, garbage collection off while timing
+    best = float('inf')
+    result = None
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = function()
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return best, result
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_case(n_states, alphabet_size, degree, lengths, seed, repeat):
+    nfa = generate_nfa(n_states, alphabet_size, degree, seed)
+    case = {'states': n_states, 'alphabet': alphabet_size, 'degree': degree}
+
+    for backend in ('sets', 'bitset'):
+        seconds, dfa = timed(lambda: nfa.nfa_to_dfa(backend=backend), repeat)
+        case[f'nfa_to_dfa_{backend}_s'] = seconds
+    case['dfa_states'] = len(dfa.states)
+    case['nfa_to_dfa_peak_bytes'] = peak_memory(nfa.nfa_to_dfa)
+
+    seconds, (minimal, _) = timed(dfa.minimize, repeat)
+    case['minimize_s'] = seconds
+    case['minimal_states'] = len(minimal.states)
+
+    compiled = compile_automaton(nfa)
+    nfa.to_bitset()
+    rng = random.Random(seed + 1)
+    symbols = sorted(nfa.alphabet)
+    matchers = {
+        'compiled': compiled.accepts,
+        'bitset': lambda s: nfa.string_belongs_to_language(s, backend='bitset'),
+        'lazy': lambda s: nfa.string_belongs_to_language(s, backend='lazy'),
+    }
+    case['throughput'] = {}
+    for length in lengths:
+        text = ''.join(rng.choice(symbols) for _ in range(length))
+        row = {}
+        for name, accepts in matchers.items():
+            if name == 'lazy':
+                nfa.lazy_dfa()  # fresh cache for every input length
+            seconds, _ = timed(lambda: accepts(text), repeat)
+            row[f'{name}_chars_per_s'] = length / max(seconds, 1e-9)
+        case['throughput'][str(length)] = row
+    return case
+
+
+def compare(results, baseline, tolerance):
+    # Times must not grow and throughputs must not shrink by more than the tolerance
+    def key(case):
+        return case['states'], case['alphabet'], case['degree']
+
+    old_cases = {key(case): case for case in baseline['cases']}
+    regressions = []
+    for case in results['cases']:
+        old = old_cases.get(key(case))
+        if old is None:
+            continue
+        for name, value in case.items():
+            if name.endswith('_s') and name in old and value > old[name] * (1 + tolerance):
+                regressions.append(f"{key(case)} {name}: {old[name]:.4g} -> {value:.4g}")
+        for length, row in case['throughput'].items():
+            for name, value in row.items():
+                old_value = old['throughput'].get(length, {}).get(name)
+                if old_value and value < old_value / (1 + tolerance):
+                    regressions.append(f"{key(case)} {name} @ {length}: {old_value:.4g} -> {value:.4g}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark automaton construction and matching.")
+    parser.add_argument('--states', type=int, nargs='+', default=[8, 16, 32])
+    parser.add_argument('--alphabet', type=int, nargs='+', default=[2, 4])
+    parser.add_argument('--degree', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--lengths', type=int, nargs='+', default=[100, 10000, 100000])
+    parser.add_argument('--seed', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help="JSON file, stdout if omitted")
+    parser.add_argument('--compare', help="baseline JSON from an earlier run")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="allowed slowdown before it is reported")
+    args = parser.parse_args(argv)
+
+    results = {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'cases': [],
+    }
+    for n_states, alphabet_size, degree in itertools.product(args.states, args.alphabet, args.degree):
+        case = run_case(n_states, alphabet_size, degree, args.lengths, args.seed, args.repeat)
+        results['cases'].append(case)
+        print(f"states={n_states} alphabet={alphabet_size} degree={degree}: "
+              f"dfa {case['dfa_states']} states in {case['nfa_to_dfa_sets_s']:.4f} s", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        for line in regressions:
+            print("slower:", line, file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,92 @@
+from compiled_dfa import transition_targets  # lab 1 is put on sys.path by 3_Conversion
+
+
+class BitsetNFA:
+    def __init__(self, fa):
+        # Every state gets one bit, a set of states is a plain int
+        states = set(fa.states) | {fa.start_state} | set(fa.accept_states)
+        for (state, _), next_states in fa.transitions.items():
+            states.add(state)
+            states.update(transition_targets(next_states))
+        self.states = sorted(states, key=str)
+        self.index = {state: i for i, state in enumerate(self.states)}
+        self.symbols = sorted((set(fa.alphabet) | {symbol for (_, symbol) in fa.transitions}) - {''})
+
+        # Epsilon closures as masks, computed once; they are folded into the start mask and the
+        # successor masks, so matching and subset construction never follow '' edges
+        epsilon = [0] * len(self.states)
+        for (state, symbol), next_states in fa.transitions.items():
+            if symbol == '':
+                for next_state in transition_targets(next_states):
+                    epsilon[self.index[state]] |= 1 << self.index[next_state]
+        self.closures = []
+        for i in range(len(self.states)):
+            reached = frontier = 1 << i
+            while frontier:
+                low_bit = frontier & -frontier
+                frontier ^= low_bit
+                new = epsilon[low_bit.bit_length() - 1] & ~reached
+                reached |= new
+                frontier |= new
+            self.closures.append(reached)
+
+        self.start_mask = self.closures[self.index[fa.start_state]]
+        self.accept_mask = 0
+        for state in fa.accept_states:
+            if state in self.index:
+                self.accept_mask |= 1 << self.index[state]
+
+        # successors[symbol][i] is the mask of states reachable from state i with symbol, one int per
+        # state so the precompute stays linear in the number of transitions
+        self.successors = {symbol: [0] * len(self.states) for symbol in self.symbols}
+        for (state, symbol), next_states in fa.transitions.items():
+            if symbol == '':
+                continue
+            masks = self.successors[symbol]
+            for next_state in transition_targets(next_states):
+                masks[self.index[state]] |= self.closures[self.index[next_state]]
+
+    def step(self, mask, symbol):
+        # One OR per active state, the set bits are visited lowest first
+        masks = self.successors.get(symbol)
+        if masks is None:
+            return 0
+        result = 0
+        while mask:
+            low_bit = mask & -mask
+            result |= masks[low_bit.bit_length() - 1]
+            mask ^= low_bit
+        return result
+
+    def accepts(self, input_string):
+        mask = self.start_mask
+        for char in input_string:
+            mask = self.step(mask, char)
+            if not mask:
+                return False
+        return mask & self.accept_mask != 0
+
+    def states_of(self, mask):
+        result = []
+        while mask:
+            low_bit = mask & -mask
+            result.append(self.states[low_bit.bit_length() - 1])
+            mask ^= low_bit
+        return result
+
+    def determinize(self):
+        # Subset construction over masks, returns {mask: {symbol: next_mask}} for every reachable subset
+        moves = {}
+        unprocessed = [self.start_mask]
+        while unprocessed:
+            mask = unprocessed.pop()
+            if mask in moves:
+                continue
+            row = moves[mask] = {}
+            for symbol in self.symbols:
+                next_mask = self.step(mask, symbol)
+                if next_mask:
+                    row[symbol] = next_mask
+                    if next_mask not in moves:
+                        unprocessed.append(next_mask)
+        return moves
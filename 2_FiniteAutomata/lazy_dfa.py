@@ -0,0 +1,70 @@
+from collections import OrderedDict
+
+
+class LazyDFA:
+    def __init__(self, nfa, cache_size=1024):
+        # nfa is a BitsetNFA, DFA states are its masks and are only built when the input reaches them.
+        # With cache_size 0 no DFA state is kept and every input is matched by NFA simulation.
+        if cache_size < 0:
+            raise ValueError(f"cache_size must not be negative, got {cache_size}")
+        self.nfa = nfa
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # mask -> {symbol: next mask}, least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.fallbacks = 0
+
+    def stats(self):
+        return {'states': len(self.cache), 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'fallbacks': self.fallbacks}
+
+    def _row(self, mask):
+        row = self.cache.get(mask)
+        if row is None:
+            if len(self.cache) >= self.cache_size:
+                self.cache.popitem(last=False)
+                self.evictions += 1
+            row = self.cache[mask] = {}
+        else:
+            self.cache.move_to_end(mask)
+        return row
+
+    def accepts(self, input_string):
+        nfa = self.nfa
+        mask = nfa.start_mask
+        if not self.cache_size:
+            self.fallbacks += 1
+            for char in input_string:
+                mask = nfa.step(mask, char)
+                if not mask:
+                    return False
+            return mask & nfa.accept_mask != 0
+        hits = misses = 0
+        run_evictions = self.evictions
+        try:
+            for position, char in enumerate(input_string):
+                row = self._row(mask)
+                next_mask = row.get(char)
+                if next_mask is None:
+                    misses += 1
+                    next_mask = row[char] = nfa.step(mask, char)
+                else:
+                    hits += 1
+                mask = next_mask
+                if not mask:
+                    return False
+                # The cache is thrashing (less than 10 characters per evicted state), building DFA
+                # states costs more than it saves, so finish this input with plain NFA simulation
+                evicted = self.evictions - run_evictions
+                if evicted > self.cache_size and position < evicted * 10:
+                    self.fallbacks += 1
+                    for char in input_string[position + 1:]:
+                        mask = nfa.step(mask, char)
+                        if not mask:
+                            return False
+                    break
+            return mask & nfa.accept_mask != 0
+        finally:
+            self.hits += hits
+            self.misses += misses
@@ -1,4 +1,7 @@
 import re
+import sys
+
+from token_buffer import TokenBuffer, relex
 
 # Token types
 KEYWORD = 'KEYWORD'
@@ -14,11 +17,16 @@ RBRACKET = 'RBRACKET'
 NEWLINE = 'NEWLINE'
 EOF = 'EOF'
 
-# Token class
+# Token class, start and end are character offsets of the token in the source text (str indices, so
+# text[start:end] is the token), not UTF-8 byte offsets; they differ once non-ASCII text comes before
 class Token:
-    def __init__(self, type, value):
+    __slots__ = ('type', 'value', 'start', 'end')
+
+    def __init__(self, type, value, start=None, end=None):
         self.type = type
         self.value = value
+        self.start = start
+        self.end = end
 
     def __str__(self):
         return f'Token({self.type}, {self.value})'
@@ -26,101 +34,254 @@ class Token:
     def __repr__(self):
         return self.__str__()
 
+TOKEN_TYPES = [KEYWORD, VARIABLE, STRING, NUMBER, EQUALS, COMMA, LPAREN, RPAREN, LBRACKET, RBRACKET, NEWLINE, EOF]
+
+def token_value(type, text):
+    # Value of a token from its source text, the inverse of the spans recorded by get_next_token.
+    # Keywords depend on the lexer class and are handled by Lexer.token_value
+    if type == NUMBER:
+        return int(text)
+    if type == STRING:
+        return text[1:-1] if len(text) > 1 and text[-1] == '"' else text[1:]  # unterminated strings run to the end
+    if type == EOF:
+        return None
+    return text
+
+# Runs of characters are found with precompiled patterns and sliced out once
+WHITESPACE = re.compile(r'\s+')
+DIGITS = re.compile(r'\d+')
+ALNUM = re.compile(r'[^\W_]+')  # the characters for which str.isalnum() is true
+SINGLE_CHAR_TOKENS = {
+    '=': EQUALS,
+    ',': COMMA,
+    '(': LPAREN,
+    ')': RPAREN,
+    '[': LBRACKET,
+    ']': RBRACKET,
+    '\n': NEWLINE,
+}
+# Fast path, one match per token: whitespace, then a single character token, a number, a closed string or a word
+TOKEN = re.compile(r'\s*(?:(?P<char>[=,()\[\]\n])|(?P<number>\d+)|"(?P<string>[^"]*)"|(?P<word>[^\W\d_][^\W_]*))?')
+
 # Lexer class
 class Lexer:
+    # Keywords of the mail DSL. The lookup table is built once per class, subclasses can change
+    # keywords or case_sensitive, and register_keywords() adds words later on.
+    keywords = frozenset(['send', 'attach', 'template', 'cc', 'bcc', 'subject', 'body'])
+    registered_keywords = frozenset()  # added by register_keywords() on this class only
+    case_sensitive = False  # otherwise keywords match in any case and the token value is the lowercase keyword
+
     def __init__(self, text):
         self.text = text
         self.pos = 0
-        self.current_char = self.text[self.pos]
-        self.keywords = ['send', 'attach', 'template', 'cc', 'bcc', 'subject', 'body']
+        self.offset = 0  # source offset of self.text[0], only moves for StreamLexer
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.build_keyword_table()
+
+    @classmethod
+    def build_keyword_table(cls):
+        # Folded keyword -> interned keyword, so every KEYWORD token shares one string per keyword.
+        # Words longer than fold_length can never be keywords and are looked up without lowercasing.
+        fold = (lambda word: word) if cls.case_sensitive else str.lower
+        words = set(cls.keywords)
+        for lexer_class in cls.__mro__:
+            words.update(vars(lexer_class).get('registered_keywords', ()))
+        cls.keyword_table = {fold(word): sys.intern(fold(word)) for word in words}
+        cls.fold_length = 0 if cls.case_sensitive else max(map(len, cls.keyword_table), default=0)
+
+    @classmethod
+    def register_keywords(cls, *words):
+        # The new keywords apply to this class and all of its subclasses (StreamLexer for Lexer), also
+        # those that set their own keywords. Register on a subclass to keep them out of the other lexers.
+        cls.registered_keywords = vars(cls).get('registered_keywords', frozenset()) | frozenset(words)
+        stack = [cls]
+        while stack:
+            lexer_class = stack.pop()
+            lexer_class.build_keyword_table()
+            stack.extend(lexer_class.__subclasses__())
+
+    def keyword(self, word):
+        # The keyword that word spells, or None
+        keyword = self.keyword_table.get(word)
+        if keyword is None and len(word) <= self.fold_length:
+            keyword = self.keyword_table.get(word.lower())
+        return keyword
+
+    @property
+    def current_char(self):
+        return self.text[self.pos] if self.pos < len(self.text) else None
 
     def error(self):
         raise Exception('Invalid character')
 
+    def fill(self):
+        # More text for a token that reaches the end of self.text, the plain lexer has none
+        return False
+
     def advance(self):
         self.pos += 1
-        if self.pos < len(self.text):
-            self.current_char = self.text[self.pos]
-        else:
-            self.current_char = None
+
+    def scan(self, pattern):
+        # The run of `pattern` starting at self.pos, self.pos is moved past it. While the run reaches the
+        # end of self.text the part found so far is set aside and only the new text is matched, so
+        # fill() does not have to keep it and a long run is matched once.
+        parts = []
+        while True:
+            match = pattern.match(self.text, self.pos)
+            if match is None:
+                break
+            parts.append(match.group())
+            self.pos = match.end()
+            if self.pos < len(self.text) or not self.fill():
+                break
+        return ''.join(parts)
 
     def skip_whitespace(self):
-        while self.current_char is not None and self.current_char.isspace():
-            self.advance()
+        # Whitespace is not a token, nothing of it is kept while more text is read
+        while True:
+            match = WHITESPACE.match(self.text, self.pos)
+            if match is None:
+                return
+            self.pos = match.end()
+            if self.pos < len(self.text) or not self.fill():
+                return
 
     def integer(self):
-        result = ''
-        while self.current_char is not None and self.current_char.isdigit():
-            result += self.current_char
-            self.advance()
-        return int(result)
+        return int(self.scan(DIGITS))
 
     def string(self):
-        result = ''
-        while self.current_char is not None and self.current_char != '"':
-            result += self.current_char
-            self.advance()
-        self.advance()  # Skip closing quote
-        return result
+        # Like scan(), the text read so far is set aside while the closing quote has not arrived
+        parts = []
+        end = self.text.find('"', self.pos)
+        while end == -1:
+            parts.append(self.text[self.pos:])
+            self.pos = len(self.text)
+            if not self.fill():
+                end = len(self.text)  # unterminated string, runs to the end of the input
+                break
+            end = self.text.find('"', self.pos)
+        parts.append(self.text[self.pos:end])
+        self.pos = end + 1  # Skip closing quote
+        return ''.join(parts)
 
     def variable(self):
-        result = ''
-        while self.current_char is not None and self.current_char.isalnum():
-            result += self.current_char
-            self.advance()
-        return result
+        return self.scan(ALNUM)
 
     def get_next_token(self):
-        while self.current_char is not None:
-            if self.current_char.isspace():
+        text = self.text
+        match = TOKEN.match(text, self.pos)
+        kind = match.lastgroup
+        # A token that reaches the end of the text may continue in the next chunk, and a word must
+        # start with a letter in the str.isalpha() sense; both cases go through the general path
+        if kind is not None and match.end() < len(text):
+            value = match.group(kind)
+            start = self.offset + match.start(kind)
+            self.pos = end = match.end()
+            end += self.offset
+            if kind == 'char':
+                return Token(SINGLE_CHAR_TOKENS[value], value, start, end)
+            if kind == 'number':
+                return Token(NUMBER, int(value), start, end)
+            if kind == 'string':
+                return Token(STRING, value, start - 1, end)
+            if value[0].isalpha():
+                keyword = self.keyword_table.get(value)
+                if keyword is None and len(value) <= self.fold_length:
+                    keyword = self.keyword_table.get(value.lower())
+                if keyword is not None:
+                    return Token(KEYWORD, keyword, start, end)
+                return Token(VARIABLE, value, start, end)
+            self.pos = match.start(kind)
+        return self.next_token()
+
+    def next_token(self):
+        # General path, one token kind at a time
+        while self.pos < len(self.text) or self.fill():
+            char = self.text[self.pos]
+            start = self.offset + self.pos
+            if char.isspace():
                 self.skip_whitespace()
                 continue
 
-            if self.current_char == '=':
-                self.advance()
-                return Token(EQUALS, '=')
+            token_type = SINGLE_CHAR_TOKENS.get(char)
+            if token_type is not None:
+                self.pos += 1
+                return Token(token_type, char, start, start + 1)
 
-            if self.current_char == ',':
-                self.advance()
-                return Token(COMMA, ',')
+            if char.isdigit():
+                value = self.integer()
+                return Token(NUMBER, value, start, self.offset + self.pos)
 
-            if self.current_char == '(':
-                self.advance()
-                return Token(LPAREN, '(')
+            if char == '"':
+                self.pos += 1
+                value = self.string()
+                return Token(STRING, value, start, self.offset + min(self.pos, len(self.text)))
 
-            if self.current_char == ')':
-                self.advance()
-                return Token(RPAREN, ')')
+            if char.isalpha():
+                token_value = self.variable()
+                end = self.offset + self.pos
+                keyword = self.keyword(token_value)
+                if keyword is not None:
+                    return Token(KEYWORD, keyword, start, end)
+                else:
+                    return Token(VARIABLE, token_value, start, end)
 
-            if self.current_char == '[':
-                self.advance()
-                return Token(LBRACKET, '[')
+            self.error()
 
-            if self.current_char == ']':
-                self.advance()
-                return Token(RBRACKET, ']')
+        end = self.offset + len(self.text)
+        return Token(EOF, None, end, end)
 
-            if self.current_char == '\n':
-                self.advance()
-                return Token(NEWLINE, '\n')
+    def tokens(self):
+        # Lazy token stream, ends with the EOF token
+        token = self.get_next_token()
+        while token.type != EOF:
+            yield token
+            token = self.get_next_token()
+        yield token
 
-            if self.current_char.isdigit():
-                return Token(NUMBER, self.integer())
+    def token_buffer(self):
+        # All tokens (EOF included) as a compact TokenBuffer over self.text, values are rebuilt on access.
+        # The buffer keeps the whole source, so this is for a Lexer over a string, not a StreamLexer.
+        buffer = TokenBuffer(self.text, TOKEN_TYPES, self.token_value, Token)
+        buffer.extend(self.tokens())
+        return buffer
 
-            if self.current_char == '"':
-                self.advance()
-                return Token(STRING, self.string())
+    @classmethod
+    def relex(cls, buffer, offset, deleted, inserted):
+        # Brings a buffer from token_buffer() up to date with an edit of its source, only the tokens
+        # around the edit are scanned again. Returns the buffer and the range of changed token indices.
+        def scan(text, position):
+            lexer = cls(text)
+            lexer.pos = position
+            for token in lexer.tokens():
+                yield token.type, token.start, token.end
+        return relex(buffer, offset, deleted, inserted, scan)
 
-            if self.current_char.isalpha():
-                token_value = self.variable()
-                if token_value.lower() in self.keywords:
-                    return Token(KEYWORD, token_value.lower())
-                else:
-                    return Token(VARIABLE, token_value)
+    def token_value(self, type, text):
+        if type == KEYWORD:
+            return self.keyword(text)
+        return token_value(type, text)
 
-            self.error()
+Lexer.build_keyword_table()
 
-        return Token(EOF, None)
+# Lexer over a file-like object, the text is read in chunks of chunk_size characters
+class StreamLexer(Lexer):
+    def __init__(self, readable, chunk_size=1 << 16):
+        self.readable = readable
+        self.chunk_size = chunk_size
+        super().__init__('')
+
+    def fill(self):
+        # Only the part from the current token on is kept, so memory is bounded by chunk and token size
+        chunk = self.readable.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.offset += self.pos
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
 
 # Example of a mail
 text = """
@@ -135,8 +296,9 @@ attach(file="lab_report.pdf")
 template(name="report_template")
 """
 
-lexer = Lexer(text)
-token = lexer.get_next_token()
-while token.type != EOF:
-    print(token)
+if __name__ == "__main__":
+    lexer = Lexer(text)
     token = lexer.get_next_token()
+    while token.type != EOF:
+        print(token)
+        token = lexer.get_next_token()
@@ -0,0 +1,120 @@
+from Lexer import EOF, Lexer, StreamLexer, text
+import io
+import random
+import unittest
+
+def as_pairs(tokens):
+    return [(token.type, token.value) for token in tokens]
+
+class TestLexerMethods(unittest.TestCase):
+    def setUp(self):
+        self.text = text
+
+    def test_tokens(self):
+        tokens = as_pairs(Lexer('send(cc=["a@b.c"], n=12)').tokens())
+        self.assertEqual(tokens, [('KEYWORD', 'send'), ('LPAREN', '('), ('KEYWORD', 'cc'), ('EQUALS', '='),
+                                  ('LBRACKET', '['), ('STRING', 'a@b.c'), ('RBRACKET', ']'), ('COMMA', ','),
+                                  ('VARIABLE', 'n'), ('EQUALS', '='), ('NUMBER', 12), ('RPAREN', ')'),
+                                  (EOF, None)])
+
+    def test_character_offsets(self):
+        source = '"é" x'
+        tokens = list(Lexer(source).tokens())
+        self.assertEqual([(t.start, t.end) for t in tokens], [(0, 3), (4, 5), (5, 5)])
+        self.assertEqual(source[tokens[1].start:tokens[1].end], 'x')
+
+    def test_stream_lexer(self):
+        expected = as_pairs(Lexer(self.text).tokens())
+        for chunk_size in (1, 2, 3, 7, 1000):
+            self.assertEqual(as_pairs(StreamLexer(io.StringIO(self.text), chunk_size).tokens()), expected)
+        rng = random.Random(3)
+        for _ in range(300):
+            script = ''.join(rng.choice('sendcb12 ="[],()\n') for _ in range(rng.randint(0, 40)))
+            try:
+                expected = as_pairs(Lexer(script).tokens())
+            except Exception:
+                continue  # stray characters
+            self.assertEqual(as_pairs(StreamLexer(io.StringIO(script), 3).tokens()), expected, repr(script))
+
+    def test_stream_lexer_bounded_buffer(self):
+        # Long runs are not kept in the buffer while more text is read
+        for text, kind in ((' ' * 5000 + 'x', 'VARIABLE'), ('"' + 'a' * 5000 + '"', 'STRING'), ('b' * 5000, 'VARIABLE')):
+            lexer = StreamLexer(io.StringIO(text), 16)
+            token = lexer.get_next_token()
+            self.assertEqual(token.type, kind)
+            self.assertEqual(token.end, len(text))
+            self.assertLessEqual(len(lexer.text), 32)
+        self.assertEqual(as_pairs(StreamLexer(io.StringIO('"' + 'a' * 100), 7).tokens()), [('STRING', 'a' * 100), (EOF, None)])
+
+    def test_token_buffer(self):
+        tokens = list(Lexer(self.text).tokens())
+        buffer = Lexer(self.text).token_buffer()
+        self.assertEqual(len(buffer), len(tokens))
+        self.assertEqual([(t.type, t.value, t.start, t.end) for t in buffer],
+                         [(t.type, t.value, t.start, t.end) for t in tokens])
+        self.assertEqual(list(buffer.values), [token.value for token in tokens])
+        self.assertEqual(buffer.values[-2], ')')
+        self.assertEqual(buffer.nbytes(), 9 * len(tokens))
+        script = 'send(body="unterminated'
+        self.assertEqual(as_pairs(Lexer(script).token_buffer()), as_pairs(Lexer(script).tokens()))
+
+    def test_keywords(self):
+        class MailLexer(Lexer):
+            pass
+        MailLexer.register_keywords('email')
+        tokens = list(MailLexer('SEND(Email=x, Body=body, sender=1)').tokens())
+        self.assertEqual([(t.type, t.value) for t in tokens if t.type in ('KEYWORD', 'VARIABLE')], [
+            ('KEYWORD', 'send'), ('KEYWORD', 'email'), ('VARIABLE', 'x'), ('KEYWORD', 'body'),
+            ('KEYWORD', 'body'), ('VARIABLE', 'sender')])
+        first, second = [t.value for t in tokens if t.value == 'body']
+        self.assertIs(first, second)
+        self.assertEqual(Lexer('email').get_next_token().type, 'VARIABLE')
+
+        # Subclasses that already exist see keywords registered on a base class
+        class StreamMailLexer(StreamLexer):
+            pass
+        class OwnKeywordsLexer(StreamMailLexer):
+            keywords = frozenset(['send'])
+        StreamMailLexer.register_keywords('email')
+        MailLexer.register_keywords('attachment')
+        StreamMailLexer.register_keywords('reply')
+        for lexer in (StreamMailLexer(io.StringIO('email reply x')), OwnKeywordsLexer(io.StringIO('email reply x'))):
+            self.assertEqual(as_pairs(lexer.tokens()),
+                             [('KEYWORD', 'email'), ('KEYWORD', 'reply'), ('VARIABLE', 'x'), (EOF, None)])
+        self.assertEqual(OwnKeywordsLexer(io.StringIO('body')).get_next_token().type, 'VARIABLE')
+        self.assertEqual(MailLexer('attachment email').get_next_token().type, 'KEYWORD')
+        self.assertEqual(StreamLexer(io.StringIO('email')).get_next_token().type, 'VARIABLE')
+
+        class StrictLexer(Lexer):
+            case_sensitive = True
+        self.assertEqual(as_pairs(StrictLexer('Send send').tokens()),
+                         [('VARIABLE', 'Send'), ('KEYWORD', 'send'), (EOF, None)])
+
+    def test_relex(self):
+        buffer = Lexer(self.text).token_buffer()
+        offset = self.text.index('Important Email')
+        buffer, changed = Lexer.relex(buffer, offset, len('Important Email'), 'Urgent", cc="x')
+        self.assertEqual([buffer.value(i) for i in changed], ['Urgent', ',', 'cc', '=', 'x'])
+        self.assertEqual(buffer.source, self.text.replace('Important Email', 'Urgent", cc="x'))
+        self.assertEqual(list(buffer.values), [t.value for t in Lexer(buffer.source).tokens()])
+
+        rng = random.Random(16)
+        alphabet = 'sendcb12 ="[],()\nx'
+        for _ in range(300):
+            script = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            buffer = Lexer(script).token_buffer()
+            for _ in range(3):
+                offset = rng.randint(0, len(script))
+                deleted = rng.randint(0, min(4, len(script) - offset))
+                inserted = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+                script = script[:offset] + inserted + script[offset + deleted:]
+                buffer, _ = Lexer.relex(buffer, offset, deleted, inserted)
+                self.assertEqual([(t.type, t.value, t.start, t.end) for t in buffer],
+                                 [(t.type, t.value, t.start, t.end) for t in Lexer(script).tokens()], repr(script))
+
+    def test_empty_input(self):
+        self.assertEqual(as_pairs(Lexer('').tokens()), [(EOF, None)])
+        self.assertEqual(as_pairs(StreamLexer(io.StringIO('')).tokens()), [(EOF, None)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+from array import array
+from bisect import bisect_left
+
+
+class TokenBuffer:
+    # Tokens stored as a struct of arrays: one type code byte and two source offsets per token.
+    # Offsets are character indices into source (as in Lexer tokens), not UTF-8 byte offsets.
+    # Values are not stored, they are sliced out of the source (and converted) when asked for.
+    def __init__(self, source, types, make_value=None, token_class=None):
+        self.source = source
+        self.types = list(types)  # type code -> token type
+        self.codes = {token_type: code for code, token_type in enumerate(self.types)}
+        self.make_value = make_value  # (token type, source slice) -> value, the slice itself if None
+        self.token_class = token_class  # built by __getitem__ as token_class(type, value, start, end)
+        self.type_codes = array('B')
+        self.starts = array('I')
+        self.ends = array('I')
+
+    def append(self, token_type, start, end):
+        self.type_codes.append(self.codes[token_type])
+        self.starts.append(start)
+        self.ends.append(end)
+
+    def extend(self, tokens):
+        for token in tokens:
+            self.append(token.type, token.start, token.end)
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    def type(self, i):
+        return self.types[self.type_codes[i]]
+
+    def span(self, i):
+        return self.starts[i], self.ends[i]
+
+    def text(self, i):
+        return self.source[self.starts[i]:self.ends[i]]
+
+    def value(self, i):
+        text = self.source[self.starts[i]:self.ends[i]]
+        if self.make_value is None:
+            return text
+        return self.make_value(self.types[self.type_codes[i]], text)
+
+    @property
+    def values(self):
+        return TokenValues(self)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        return self.token_class(self.type(i), self.value(i), self.starts[i], self.ends[i])
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self):
+        # Memory used by the token arrays, the source text is shared and not counted
+        return sum(column.itemsize * len(column) for column in (self.type_codes, self.starts, self.ends))
+
+
+class TokenValues:
+    # Read-only sequence view of the token values, each one is built on access
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.buffer.value(j) for j in range(*i.indices(len(self.buffer)))]
+        if i < 0:
+            i += len(self.buffer)
+        if not 0 <= i < len(self.buffer):
+            raise IndexError('token index out of range')
+        return self.buffer.value(i)
+
+    def __iter__(self):
+        for i in range(len(self.buffer)):
+            yield self.buffer.value(i)
+
+
+def relex(buffer, offset, deleted, inserted, scan):
+    # Updates buffer in place after replacing `deleted` characters at `offset` of its source with `inserted`.
+    # scan(text, position) yields (type, start, end) for the tokens of text from position on, and must
+    # give the same tokens from any token boundary as a scan from the start. Scanning restarts after the
+    # last token that ends before the edit and stops at the first token past the edit that starts where
+    # an old token started (shifted by the edit), from there on the old tokens are reused.
+    # Returns the buffer and the range of new token indices that replaced old tokens.
+    old_stop = len(buffer)
+    source = buffer.source[:offset] + inserted + buffer.source[offset + deleted:]
+    delta = len(inserted) - deleted
+    edit_end = offset + len(inserted)
+    starts, ends, type_codes, codes = buffer.starts, buffer.ends, buffer.type_codes, buffer.codes
+
+    first = bisect_left(ends, offset)
+    position = ends[first - 1] if first else 0
+    new_codes, new_starts, new_ends = array('B'), array('I'), array('I')
+    j = first
+    for token_type, start, end in scan(source, position):
+        if start > edit_end:
+            # Old tokens that start before this one can no longer be matched
+            while j < old_stop and starts[j] + delta < start:
+                j += 1
+            if (j < old_stop and starts[j] + delta == start and ends[j] + delta == end
+                    and type_codes[j] == codes[token_type]):
+                old_stop = j
+                break
+        new_codes.append(codes[token_type])
+        new_starts.append(start)
+        new_ends.append(end)
+
+    if delta:
+        starts[old_stop:] = array('I', [start + delta for start in starts[old_stop:]])
+        ends[old_stop:] = array('I', [end + delta for end in ends[old_stop:]])
+    type_codes[first:old_stop] = new_codes
+    starts[first:old_stop] = new_starts
+    ends[first:old_stop] = new_ends
+    buffer.source = source
+    return buffer, range(first, first + len(new_codes))
@@ -0,0 +1,132 @@
+from regex_compiler import ALTERNATION, LITERAL, REPEAT, compile_regex, print_step
+import contextlib
+import importlib
+import io
+import itertools
+import os
+import random
+import re
+import tempfile
+import unittest
+
+PATTERNS = ['(S|T)(U|V)W*Y+24', 'L(M|N)O^3P*Q(2|3)', 'R*S(T|U|V)W(X|Y|Z)^2', 'a(b|(c|d)e)+f', '((a|bc)d)*|x^12']
+
+def to_python_regex(pattern, max_repeat=4):
+    # The same language in re syntax
+    pattern = re.sub(r'\^(\d+)', r'{\1}', pattern)
+    return pattern.replace('*', '{0,%d}' % max_repeat).replace('+', '{1,%d}' % max_repeat)
+
+class TestRegexCompiler(unittest.TestCase):
+    def test_generated_strings_match(self):
+        rng = random.Random(21)
+        for pattern in PATTERNS:
+            compiled = compile_regex(pattern)
+            matcher = re.compile(to_python_regex(pattern))
+            for _ in range(500):
+                text = compiled.generate(rng)
+                self.assertTrue(matcher.fullmatch(text), (pattern, text))
+
+    def test_ast(self):
+        self.assertEqual(compile_regex('(X|Y|Z)^2').ast,
+                         (REPEAT, (ALTERNATION, [(LITERAL, 'X'), (LITERAL, 'Y'), (LITERAL, 'Z')]), 2, 2))
+        self.assertEqual(compile_regex('ab^c').ast, (LITERAL, 'ab^c'))
+        self.assertIs(compile_regex('a*'), compile_regex('a*'))
+
+    def test_generate_batch(self):
+        for pattern in PATTERNS + ['a\nb*', '']:
+            compiled = compile_regex(pattern)
+            strings = compiled.generate_batch(3000, seed=22, chunk_size=1000)
+            self.assertEqual(len(strings), 3000)
+            matcher = re.compile(to_python_regex(pattern))
+            for text in strings:
+                self.assertTrue(matcher.fullmatch(text), (pattern, text))
+            self.assertEqual(compiled.generate_batch(3000, seed=22, chunk_size=1000), strings)
+        self.assertEqual(len(set(compile_regex('(S|T)(U|V)W*Y+24').generate_batch(5000, seed=1))), 80)
+
+    def test_enumerate(self):
+        compiled = compile_regex('L(M|N)O^3P*Q(2|3)')
+        strings = list(compiled.enumerate())
+        self.assertEqual(strings[:5], ['LMOOOQ2', 'LMOOOQ3', 'LNOOOQ2', 'LNOOOQ3', 'LMOOOPQ2'])
+        self.assertEqual(len(strings), 20)
+        self.assertEqual(list(compiled.enumerate(order='lex')), sorted(strings))
+        self.assertEqual(list(compiled.enumerate(max_length=8)), strings[:8])
+
+        # Ambiguous patterns still give every string once; checked against all strings over the alphabet
+        for pattern in ('(a|ab)(b|)*', 'a*a*b', '((a|bc)d)*|x^3', 'a(b|(c|d)e)+f'):
+            compiled = compile_regex(pattern, 2)
+            strings = list(compiled.enumerate())
+            self.assertEqual(strings, sorted(strings, key=lambda text: (len(text), text)))
+            matcher = re.compile(to_python_regex(pattern, 2))
+            alphabet = sorted(set(pattern) - set('()|*+^0123456789'))
+            expected = [''.join(chars) for length in range(len(strings[-1]) + 1)
+                        for chars in itertools.product(alphabet, repeat=length) if matcher.fullmatch(''.join(chars))]
+            self.assertEqual(strings, expected, pattern)
+
+    def test_count(self):
+        self.assertEqual(compile_regex('(S|T)(U|V)W*Y+24').count(), 80)
+        self.assertEqual(compile_regex('L(M|N)O^3P*Q(2|3)').count(max_length=8), 8)
+        self.assertEqual(compile_regex('(a|b)^40').count(), 2 ** 40)
+        unbounded = compile_regex('(a|b)*c', None)
+        self.assertEqual(list(unbounded.enumerate(3)), ['c', 'ac', 'bc', 'aac', 'abc', 'bac', 'bbc'])
+        self.assertEqual(unbounded.count(40), 2 ** 40 - 1)
+        with self.assertRaises(ValueError):
+            unbounded.count()
+        with self.assertRaises(ValueError):
+            unbounded.generate()
+
+    def test_automaton(self):
+        from regex_automaton import compile_matcher, regex_to_dfa, regex_to_nfa, main
+        from compiled_dfa import CompiledDFA
+        rng = random.Random(25)
+        for pattern in PATTERNS:
+            bounded = re.compile(to_python_regex(pattern))
+            unbounded = re.compile(re.sub(r'\^(\d+)', r'{\1}', pattern))
+            nfa = regex_to_nfa(pattern)
+            dfa = regex_to_dfa(pattern)
+            matcher = compile_matcher(pattern)
+            bounded_matcher = compile_matcher(pattern, 4)
+            generated = compile_regex(pattern).generate_batch(300, seed=25)
+            alphabet = sorted(set(pattern) - set('()|*+^'))
+            others = [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 14))) for _ in range(300)]
+            self.assertTrue(all(bounded_matcher.accepts_batch(generated)))
+            for text in generated + others:
+                expected = bool(unbounded.fullmatch(text))
+                self.assertEqual(nfa.string_belongs_to_language(text), expected, (pattern, text))
+                self.assertEqual(dfa.string_belongs_to_language(text), expected, (pattern, text))
+                self.assertEqual(matcher.accepts(text), expected, (pattern, text))
+                self.assertEqual(bounded_matcher.accepts(text), bool(bounded.fullmatch(text)), (pattern, text))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'pattern.dfa')
+            with contextlib.redirect_stderr(io.StringIO()):
+                main(['L(M|N)O^3P*Q(2|3)', '--output', path])
+            loaded = CompiledDFA.load(path)
+            self.assertTrue(loaded.accepts('LNOOOPPPPPPQ3'))
+            self.assertFalse(loaded.accepts('LNOOPQ3'))
+
+    def test_errors(self):
+        for pattern in ('(ab', 'ab)', '*a', 'a(+)'):
+            with self.assertRaises(ValueError):
+                compile_regex(pattern)
+
+    def test_generate_string(self):
+        for name, pattern in (('regex1', PATTERNS[0]), ('regex2', PATTERNS[1]), ('regex3', PATTERNS[2])):
+            module = importlib.import_module(name)
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                text = module.generate_string(pattern)
+            self.assertTrue(re.fullmatch(to_python_regex(pattern), text))
+            self.assertEqual(output.getvalue(), '')
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                text = module.generate_string(pattern, trace=print_step)
+            self.assertTrue(output.getvalue().endswith(f"Current string: {text}\n"))
+
+    def test_trace(self):
+        events = []
+        text = compile_regex('L(M|N)O^3P*Q(2|3)').generate(random.Random(23), trace=lambda *event: events.append(event))
+        self.assertEqual([construct for construct, _, _ in events], ['L', '(M|N)', 'O^3', 'P*', 'Q', '(2|3)'])
+        self.assertEqual(''.join(added for _, added, _ in events), text)
+        self.assertEqual(events[-1][2], text)
+        self.assertEqual(events[2][1], 'OOO')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+# Turns patterns of the regex dialect into finite automata of the 2_FiniteAutomata lab.
+#
+#   python regex_automaton.py "(S|T)(U|V)W*Y+24" --output pattern.dfa
+#   python "../1_ RegularGrammars/check_membership.py" strings.txt --automaton pattern.dfa
+#
+# The pattern goes through a Thompson NFA (epsilon moves are '' transitions), nfa_to_dfa and
+# compile_automaton, so strings are matched with one table lookup per character.
+
+import argparse
+import importlib
+import os
+import sys
+
+LAB_2 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '2_FiniteAutomata')
+if LAB_2 not in sys.path:
+    sys.path.append(LAB_2)
+conversion = importlib.import_module('3_Conversion')
+compile_automaton = conversion.compile_automaton
+from regex_compiler import compile_regex, thompson
+
+
+def regex_to_nfa(pattern, max_repeat=None):
+    # Thompson NFA as a FiniteAutomaton with states q0, q1, ... By default * and + have no upper
+    # bound; with max_repeat the automaton accepts exactly what the generators can produce.
+    edges, start, accept = thompson(compile_regex(pattern, max_repeat).ast)
+    nfa = conversion.FiniteAutomaton()
+    nfa.states = {f'q{state}' for state in range(len(edges))}
+    nfa.alphabet = {symbol for row in edges for symbol, _ in row if symbol != ''}
+    nfa.transitions = {}
+    for state, row in enumerate(edges):
+        for symbol, next_state in row:
+            nfa.transitions.setdefault((f'q{state}', symbol), set()).add(f'q{next_state}')
+    nfa.start_state = f'q{start}'
+    nfa.accept_states = {f'q{accept}'}
+    return nfa
+
+
+def regex_to_dfa(pattern, max_repeat=None):
+    return regex_to_nfa(pattern, max_repeat).nfa_to_dfa()
+
+
+def compile_matcher(pattern, max_repeat=None, minimize=True):
+    # CompiledDFA for the pattern, use accepts(string) or accepts_batch(strings)
+    compiled = compile_automaton(regex_to_dfa(pattern, max_repeat))
+    if minimize:
+        compiled, _ = compiled.minimize()
+    return compiled
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile a pattern into an automaton file for check_membership.py.")
+    parser.add_argument('pattern')
+    parser.add_argument('--output', required=True, help="compiled automaton file")
+    parser.add_argument('--max-repeat', type=int, help="bound for * and + (default: unbounded)")
+    args = parser.parse_args(argv)
+
+    matcher = compile_matcher(args.pattern, args.max_repeat)
+    matcher.save(args.output)
+    print(f"{args.pattern}: {matcher.n_states} states, written to {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,519 @@
+import functools
+import random
+
+# Node kinds of the compiled pattern. Nodes are tuples:
+#   (LITERAL, text)  (CONCAT, [nodes])  (ALTERNATION, [nodes])  (REPEAT, node, min, max)
+LITERAL = 'literal'
+CONCAT = 'concat'
+ALTERNATION = 'alternation'
+REPEAT = 'repeat'
+
+SPECIAL = '()|*+'
+
+
+# Recursive descent over the pattern:
+#   regex  -> branch ('|' branch)*
+#   branch -> piece*
+#   piece  -> atom ('*' | '+' | '^' digits)*
+#   atom   -> '(' regex ')' | character
+# X* repeats X 0 to max_repeat times, X+ 1 to max_repeat times and X^n exactly n times. Every
+# repetition of a group makes its own choice. A '^' that is not followed by digits is a character.
+# With max_repeat None, * and + have no upper bound (max is None in the REPEAT node); such patterns
+# can be enumerated up to a length and matched, but not generated.
+class RegexParser:
+    def __init__(self, pattern, max_repeat=4):
+        self.pattern = pattern
+        self.max_repeat = max_repeat
+        self.pos = 0
+
+    def error(self, message):
+        raise ValueError(f"{message} at position {self.pos} in {self.pattern!r}")
+
+    def parse(self):
+        # Returns the top level as a list of (node, start, end) pieces, or one alternation piece
+        pieces = self.branch()
+        if self.pos < len(self.pattern) and self.pattern[self.pos] == '|':
+            node = self.alternation(pieces)
+            pieces = [(node, 0, self.pos)]
+        if self.pos < len(self.pattern):
+            self.error("Unbalanced ')'")
+        return pieces
+
+    def regex(self):
+        return self.alternation(self.branch())
+
+    def alternation(self, pieces):
+        options = [concat(pieces)]
+        while self.pos < len(self.pattern) and self.pattern[self.pos] == '|':
+            self.pos += 1
+            options.append(concat(self.branch()))
+        return options[0] if len(options) == 1 else (ALTERNATION, options)
+
+    def branch(self):
+        pieces = []
+        while self.pos < len(self.pattern) and self.pattern[self.pos] not in '|)':
+            start = self.pos
+            node = self.piece()
+            if pieces and node[0] == LITERAL and pieces[-1][0][0] == LITERAL:
+                # Runs of plain characters become one literal
+                pieces[-1] = ((LITERAL, pieces[-1][0][1] + node[1]), pieces[-1][1], self.pos)
+            else:
+                pieces.append((node, start, self.pos))
+        return pieces
+
+    def piece(self):
+        pattern = self.pattern
+        node = self.atom()
+        while self.pos < len(pattern):
+            char = pattern[self.pos]
+            if char == '*':
+                node = (REPEAT, node, 0, self.max_repeat)
+                self.pos += 1
+            elif char == '+':
+                node = (REPEAT, node, 1, self.max_repeat)
+                self.pos += 1
+            elif char == '^' and pattern[self.pos + 1:self.pos + 2].isdigit():
+                end = self.pos + 1
+                while end < len(pattern) and pattern[end].isdigit():
+                    end += 1
+                count = int(pattern[self.pos + 1:end])
+                node = (REPEAT, node, count, count)
+                self.pos = end
+            else:
+                break
+        return node
+
+    def atom(self):
+        char = self.pattern[self.pos]
+        if char == '(':
+            self.pos += 1
+            node = self.regex()
+            if self.pos >= len(self.pattern) or self.pattern[self.pos] != ')':
+                self.error("Missing ')'")
+            self.pos += 1
+            return node
+        if char in SPECIAL:
+            self.error(f"Nothing to repeat before {char!r}")
+        self.pos += 1
+        return (LITERAL, char)
+
+
+def concat(pieces):
+    if len(pieces) == 1:
+        return pieces[0][0]
+    if not pieces:
+        return (LITERAL, '')
+    return (CONCAT, [node for node, _, _ in pieces])
+
+
+def build(node):
+    # Turns a node into a function run(out, random) that appends the generated text to the list out.
+    # Shapes that are common in the lab patterns (a choice between literals, a repeated literal)
+    # get their own functions.
+    kind = node[0]
+    if kind == LITERAL:
+        text = node[1]
+
+        def run(out, random):
+            out.append(text)
+    elif kind == CONCAT:
+        parts = [build(child) for child in node[1]]
+
+        def run(out, random):
+            for part in parts:
+                part(out, random)
+    elif kind == ALTERNATION and all(option[0] == LITERAL for option in node[1]):
+        texts = [option[1] for option in node[1]]
+        n = len(texts)
+
+        def run(out, random):
+            out.append(texts[int(random() * n)])
+    elif kind == ALTERNATION:
+        options = [build(option) for option in node[1]]
+        n = len(options)
+
+        def run(out, random):
+            options[int(random() * n)](out, random)
+    elif node[1][0] == LITERAL:
+        _, (_, text), low, high = node
+        span = high - low + 1
+
+        def run(out, random):
+            out.append(text * (low + int(random() * span)))
+    else:
+        _, child, low, high = node
+        part = build(child)
+        span = high - low + 1
+
+        def run(out, random):
+            for _ in range(low + int(random() * span)):
+                part(out, random)
+    return run
+
+
+class BatchGenerator:
+    # Generates many strings at once with NumPy. Every node adds columns of literal codes with one row
+    # per string, a row is its string: the texts of its codes in column order. The literal table
+    # holds every text a node can add in one step (x^3 and the choices of x* are literals of their
+    # own), code 0 is the empty string and marks nodes that a row does not take.
+    def __init__(self, ast):
+        import numpy as np
+        self.np = np
+        self.literals = {'': 0}
+        self.run = self.build(ast)
+        # Rows are joined with a newline and split again, unless a literal contains one
+        self.separator = None if any('\n' in text for text in self.literals) else self.code('\n')
+        texts = [text.encode('utf-8') for text in self.literals]
+        self.width = max(1, max(map(len, texts)))
+        self.table = np.zeros((len(texts), self.width), np.uint8)
+        self.valid = np.zeros((len(texts), self.width), bool)
+        for code, data in enumerate(texts):
+            self.table[code, :len(data)] = np.frombuffer(data, np.uint8)
+            self.valid[code, :len(data)] = True
+        self.lengths = self.valid.sum(axis=1)
+        columns = []
+        self.run(columns, None, np.random.default_rng(0), 1)
+        self.n_columns = len(columns) + 1
+
+    def code(self, text):
+        return self.literals.setdefault(text, len(self.literals))
+
+    def build(self, node):
+        np = self.np
+        kind = node[0]
+        if kind == LITERAL:
+            code = self.code(node[1])
+
+            def run(columns, mask, rng, n):
+                columns.append(np.full(n, code) if mask is None else np.where(mask, code, 0))
+        elif kind == CONCAT:
+            parts = [self.build(child) for child in node[1]]
+
+            def run(columns, mask, rng, n):
+                for part in parts:
+                    part(columns, mask, rng, n)
+        elif (kind == ALTERNATION and all(option[0] == LITERAL for option in node[1])) or \
+                (kind == REPEAT and node[1][0] == LITERAL):
+            if kind == ALTERNATION:
+                texts = [option[1] for option in node[1]]
+            else:
+                _, (_, text), low, high = node
+                texts = [text * count for count in range(low, high + 1)]
+            codes = np.array([self.code(text) for text in texts])
+
+            def run(columns, mask, rng, n):
+                column = codes[rng.integers(0, len(codes), n)]
+                columns.append(column if mask is None else np.where(mask, column, 0))
+        elif kind == ALTERNATION:
+            options = [self.build(option) for option in node[1]]
+
+            def run(columns, mask, rng, n):
+                choices = rng.integers(0, len(options), n)
+                for i, option in enumerate(options):
+                    taken = choices == i
+                    option(columns, taken if mask is None else taken & mask, rng, n)
+        else:
+            _, child, low, high = node
+            part = self.build(child)
+
+            def run(columns, mask, rng, n):
+                counts = rng.integers(low, high + 1, n)
+                for i in range(high):
+                    taken = counts > i
+                    part(columns, taken if mask is None else taken & mask, rng, n)
+        return run
+
+    def generate(self, count, rng, chunk_size):
+        np = self.np
+        # Rows per chunk, so that the byte matrix of a chunk stays around 64 MB
+        rows = max(1, min(chunk_size, (1 << 26) // (self.n_columns * self.width)))
+        result = []
+        for start in range(0, count, rows):
+            n = min(rows, count - start)
+            columns = []
+            self.run(columns, None, rng, n)
+            if self.separator is not None:
+                columns.append(np.full(n, self.separator))
+            codes = np.stack(columns, axis=1) if columns else np.zeros((n, 0), int)
+            data = self.table[codes][self.valid[codes]].tobytes()
+            if self.separator is not None:
+                strings = data.decode('utf-8').split('\n')
+                strings.pop()
+            else:
+                ends = np.cumsum(self.lengths[codes].sum(axis=1)).tolist()
+                strings = [data[begin:end].decode('utf-8') for begin, end in zip([0] + ends, ends)]
+            result.extend(strings)
+        return result
+
+
+class CompiledRegex:
+    def __init__(self, pattern, max_repeat=4):
+        self.pattern = pattern
+        self.max_repeat = max_repeat
+        pieces = RegexParser(pattern, max_repeat).parse()
+        self.ast = concat(pieces)
+        self._batch = None
+        self._dfa = None
+        if max_repeat is None:
+            self.pieces = self._run = None
+            return
+        # Top level pieces with their source text, a step of generate_steps() is one piece
+        self.pieces = [(pattern[start:end], build(node)) for node, start, end in pieces]
+        self._run = build(self.ast)
+
+    def check_bounded(self):
+        if self.max_repeat is None:
+            raise ValueError(f"{self.pattern!r} was compiled without max_repeat, * and + have no bound to generate with")
+
+    def generate(self, rng=random, trace=None):
+        # trace, if given, is called as trace(construct, added text, current string) for every top
+        # level piece of the pattern; without it nothing but the generation itself runs
+        if trace is not None:
+            current = ''
+            for construct, added, current in self.generate_steps(rng):
+                trace(construct, added, current)
+            return current
+        if self._run is None:
+            self.check_bounded()
+        out = []
+        self._run(out, rng.random)
+        return ''.join(out)
+
+    def generate_batch(self, count, seed=None, chunk_size=1 << 18):
+        # count strings with every random choice drawn in bulk from a NumPy Generator. seed is
+        # anything numpy.random.default_rng accepts (None, an int, a Generator), the same seed
+        # gives the same strings.
+        import numpy as np
+        self.check_bounded()
+        if self._batch is None:
+            self._batch = BatchGenerator(self.ast)
+        return self._batch.generate(count, np.random.default_rng(seed), chunk_size)
+
+    def generate_steps(self, rng=random):
+        # (piece of the pattern, text it added, string so far) for every top level piece
+        self.check_bounded()
+        out = []
+        current = ''
+        for source, run in self.pieces:
+            start = len(out)
+            run(out, rng.random)
+            added = ''.join(out[start:])
+            current += added
+            yield source, added, current
+
+    def dfa(self):
+        # Deterministic (not minimized) automaton of the language, built once, see regex_dfa()
+        if self._dfa is None:
+            self._dfa = regex_dfa(self.ast)
+        return self._dfa
+
+    def enumerate(self, max_length=None, order='length'):
+        # Every string of the language exactly once, lazily. order='length' gives shorter strings
+        # first and each length in lexicographic order, order='lex' plain lexicographic order.
+        # max_length may only be left out when the language is finite.
+        moves, accepting = self.dfa()
+        bound = self._length_bound(max_length)
+        reach = exact_reach(moves, accepting, bound)
+        if order == 'length':
+            for length in range(bound + 1):
+                yield from walk(moves, lambda state, depth: depth == length,
+                                lambda state, depth: depth <= length and state in reach[length - depth])
+        elif order == 'lex':
+            within = [set() for _ in range(bound + 1)]  # states with an accepted suffix of at most k characters
+            for k in range(bound + 1):
+                within[k] = reach[k] | (within[k - 1] if k else set())
+            yield from walk(moves, lambda state, depth: accepting[state],
+                            lambda state, depth: depth <= bound and state in within[bound - depth])
+        else:
+            raise ValueError(f"Unknown order: {order}")
+
+    def count(self, max_length=None):
+        # Number of strings in the language (up to max_length), by dynamic programming over the
+        # automaton: ways[s] is the number of accepted strings of the current length starting at s
+        moves, accepting = self.dfa()
+        bound = self._length_bound(max_length)
+        ways = [1 if accepted else 0 for accepted in accepting]
+        total = ways[0]
+        for _ in range(bound):
+            ways = [sum(ways[next_state] for next_state in row.values()) for row in moves]
+            total += ways[0]
+        return total
+
+    def _length_bound(self, max_length):
+        longest = longest_string(*self.dfa())
+        if longest is None:
+            if max_length is None:
+                raise ValueError(f"The language of {self.pattern!r} is infinite, give max_length")
+            return max_length
+        return longest if max_length is None else min(longest, max_length)
+
+
+def thompson(node):
+    # NFA with epsilon ('') edges for a node, returned as (edges, start, accept): edges[s] lists (symbol, next)
+    edges = []
+
+    def state():
+        edges.append([])
+        return len(edges) - 1
+
+    def fragment(node):
+        kind = node[0]
+        if kind == LITERAL:
+            start = end = state()
+            for char in node[1]:
+                next_state = state()
+                edges[end].append((char, next_state))
+                end = next_state
+            return start, end
+        if kind == CONCAT:
+            start, end = fragment(node[1][0])
+            for child in node[1][1:]:
+                child_start, child_end = fragment(child)
+                edges[end].append(('', child_start))
+                end = child_end
+            return start, end
+        if kind == ALTERNATION:
+            start, end = state(), state()
+            for option in node[1]:
+                option_start, option_end = fragment(option)
+                edges[start].append(('', option_start))
+                edges[option_end].append(('', end))
+            return start, end
+        _, child, low, high = node
+        start = end = state()
+        for _ in range(low):
+            child_start, child_end = fragment(child)
+            edges[end].append(('', child_start))
+            end = child_end
+        if high is None:
+            # Loop back to the end of the required copies
+            child_start, child_end = fragment(child)
+            edges[end].append(('', child_start))
+            edges[child_end].append(('', end))
+            return start, end
+        last = state()
+        for _ in range(high - low):
+            edges[end].append(('', last))
+            child_start, child_end = fragment(child)
+            edges[end].append(('', child_start))
+            end = child_end
+        edges[end].append(('', last))
+        return start, last
+
+    start, accept = fragment(node)
+    return edges, start, accept
+
+
+def regex_dfa(node):
+    # Subset construction over the Thompson NFA. Returns (moves, accepting): moves[s] maps symbols to
+    # states in sorted symbol order, state 0 is the start, and only states from which an accepted
+    # string can still be reached are kept, so every path of the automaton spells a distinct prefix.
+    edges, start, accept = thompson(node)
+
+    def closure(states):
+        stack = list(states)
+        result = set(states)
+        while stack:
+            for symbol, next_state in edges[stack.pop()]:
+                if symbol == '' and next_state not in result:
+                    result.add(next_state)
+                    stack.append(next_state)
+        return frozenset(result)
+
+    subsets = [closure([start])]
+    index = {subsets[0]: 0}
+    raw_moves = []
+    for subset in subsets:  # grows while it is walked
+        targets = {}
+        for state in subset:
+            for symbol, next_state in edges[state]:
+                if symbol != '':
+                    targets.setdefault(symbol, set()).add(next_state)
+        row = {}
+        for symbol in sorted(targets):
+            target = closure(targets[symbol])
+            if target not in index:
+                index[target] = len(subsets)
+                subsets.append(target)
+            row[symbol] = index[target]
+        raw_moves.append(row)
+    raw_accepting = [accept in subset for subset in subsets]
+
+    # Drop states that cannot reach an accepting state
+    incoming = [[] for _ in subsets]
+    for state, row in enumerate(raw_moves):
+        for next_state in row.values():
+            incoming[next_state].append(state)
+    useful = {state for state, accepted in enumerate(raw_accepting) if accepted}
+    stack = list(useful)
+    while stack:
+        for previous in incoming[stack.pop()]:
+            if previous not in useful:
+                useful.add(previous)
+                stack.append(previous)
+    if 0 not in useful:
+        return [{}], [False]  # empty language
+    order = [0] + sorted(useful - {0})
+    renumber = {state: i for i, state in enumerate(order)}
+    moves = [{symbol: renumber[next_state] for symbol, next_state in raw_moves[state].items() if next_state in useful}
+             for state in order]
+    return moves, [raw_accepting[state] for state in order]
+
+
+def exact_reach(moves, accepting, bound):
+    # reach[k] is the set of states that accept some string of exactly k more characters
+    reach = [{state for state, accepted in enumerate(accepting) if accepted}]
+    for _ in range(bound):
+        previous = reach[-1]
+        reach.append({state for state, row in enumerate(moves) if any(next_state in previous for next_state in row.values())})
+    return reach
+
+
+def longest_string(moves, accepting):
+    # Length of the longest accepted string, None if the automaton has a cycle (infinite language)
+    longest = [None] * len(moves)
+    on_path = [False] * len(moves)
+    stack = [(0, iter(moves[0].values()))]
+    on_path[0] = True
+    while stack:
+        state, children = stack[-1]
+        for next_state in children:
+            if on_path[next_state]:
+                return None
+            if longest[next_state] is None:
+                on_path[next_state] = True
+                stack.append((next_state, iter(moves[next_state].values())))
+                break
+        else:
+            stack.pop()
+            on_path[state] = False
+            lengths = [longest[next_state] + 1 for next_state in moves[state].values()]
+            longest[state] = max(lengths + [0 if accepting[state] else -1])
+    return longest[0]
+
+
+def walk(moves, emit, enter):
+    # Depth-first walk in symbol order without recursion, yields the path strings for which
+    # emit(state, depth) holds and only goes into states for which enter(state, depth) holds
+    if not enter(0, 0):
+        return
+    stack = [(0, '')]
+    while stack:
+        state, prefix = stack.pop()
+        depth = len(prefix)
+        if emit(state, depth):
+            yield prefix
+        for symbol, next_state in reversed(moves[state].items()):
+            if enter(next_state, depth + 1):
+                stack.append((next_state, prefix + symbol))
+
+
+def print_step(construct, added, current):
+    # Trace hook that prints the steps the way the lab scripts always did
+    print(f"Added {added}->{current}")
+    print("Current string:", current)
+
+
+@functools.lru_cache(maxsize=256)
+def compile_regex(pattern, max_repeat=4):
+    return CompiledRegex(pattern, max_repeat)
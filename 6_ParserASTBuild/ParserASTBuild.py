@@ -1,6 +1,15 @@
+import bisect
 import enum
+import json
+import os
 import re
-from graphviz import Digraph
+import sys
+
+LAB_3 = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '3_LexerScanner')
+if LAB_3 not in sys.path:
+    sys.path.append(LAB_3)
+from token_buffer import TokenBuffer, relex
+from arena_ast import ArenaAST
 
 class TokenType(enum.Enum):
     KEYWORD = 'KEYWORD'
@@ -30,10 +39,20 @@ token_patterns = [
     (TokenType.NEWLINE, r'\n')
 ]
 
+# All patterns in one alternation, compiled once. Alternatives are tried in list order at every
+# position, exactly like trying the patterns one by one, and finditer skips unmatched characters.
+master_pattern = re.compile('|'.join(f'(?P<{token_type.name}>{regex})' for token_type, regex in token_patterns))
+token_types = {token_type.name: token_type for token_type in TokenType}
+
+# start and end are character offsets of the token in the source text (str indices, not UTF-8 bytes)
 class Token:
-    def __init__(self, type, value):
+    __slots__ = ('type', 'value', 'start', 'end')
+
+    def __init__(self, type, value, start=None, end=None):
         self.type = type
         self.value = value
+        self.start = start
+        self.end = end
 
     def __str__(self):
         return f'Token({self.type.value}, {self.value})'
@@ -60,84 +79,326 @@ class AST:
         else:
             self.root.add_child(node)
 
-    def visualize(self):
-        dot = Digraph()
-        self._visualize(self.root, dot)
-        dot.render('ast', view=True)
+    def visualize(self, path='ast', format='pdf', view=True):
+        # Writes the DOT source to path and renders it with graphviz, see write_dot to skip rendering
+        with open(path, 'w', encoding='utf-8') as file:
+            self.write_dot(file)
+        return render_dot(path, format, view)
+
+    def nodes(self):
+        # Pre-order (node, parent number, number) triples without recursion, nodes are numbered
+        # from 0 in pre-order and the root has parent number None
+        if self.root is None:
+            return
+        stack = [(self.root, None)]
+        number = 0
+        while stack:
+            node, parent = stack.pop()
+            yield node, parent, number
+            for child in reversed(node.children):
+                stack.append((child, number))
+            number += 1
+
+    def write_dot(self, file):
+        write = file.write
+        write('digraph {\n')
+        for node, parent, number in self.nodes():
+            label = node.type.value if node.value is None else f'{node.type.value}: {node.value}'
+            label = label.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+            write(f'\tn{number} [label="{label}"]\n')
+            if parent is not None:
+                write(f'\tn{parent} -> n{number}\n')
+        write('}\n')
 
-    def _visualize(self, node, dot, parent=None):
-        if node is None:
+    def write_json(self, file):
+        # {"type": ..., "value": ..., "children": [...]} for every node, written as the tree is walked
+        write = file.write
+        if self.root is None:
+            write('null')
             return
-        node_id = f'{id(node)}'
-        label = f'{node.type.value}: {node.value}'
-        dot.node(node_id, label)
-        if parent:
-            dot.edge(parent, node_id)
-        for child in node.children:
-            self._visualize(child, dot, node_id)
+        stack = [iter([self.root])]
+        first = [True]
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                first.pop()
+                if stack:
+                    write(']}')
+                continue
+            if not first[-1]:
+                write(', ')
+            first[-1] = False
+            write(f'{{"type": {json.dumps(node.type.value)}, "value": {json.dumps(node.value)}, "children": [')
+            stack.append(iter(node.children))
+            first.append(True)
+
+    def write_binary(self, file):
+        # The tree as a serialized ArenaAST, read it back with ArenaAST.from_bytes(data, ARENA_NODE_TYPES)
+        arena = ArenaAST(ARENA_NODE_TYPES)
+        for node, parent, number in self.nodes():
+            arena.node(node.type, node.value)  # arena indices are the pre-order numbers
+            if parent is None:
+                arena.roots.append(number)
+            else:
+                arena.add_child(parent, number)
+        file.write(arena.to_bytes())
+
+def render_dot(path, format='pdf', view=False):
+    # Runs the graphviz dot binary on a DOT file, returns the path of the rendered file
+    import graphviz
+    rendered = graphviz.render('dot', format, path)
+    if view:
+        graphviz.view(rendered)
+    return rendered
 
 def lex(input_string):
-    tokens = []
-    position = 0
-    while position < len(input_string):
-        match = None
-        for token_type, regex in token_patterns:
-            regex = re.compile(regex)
-            match = regex.match(input_string, position)
-            if match:
-                tokens.append(Token(token_type, match.group()))
-                position = match.end()
-                break
-        if not match:
-            position += 1  # Skip character if no match
-    tokens.append(Token(TokenType.EOF, None))
+    tokens = [Token(token_types[match.lastgroup], match.group(), match.start(), match.end())
+              for match in master_pattern.finditer(input_string)]
+    tokens.append(Token(TokenType.EOF, None, len(input_string), len(input_string)))
     return tokens
 
+def token_value(type, text):
+    return None if type == TokenType.EOF else text
+
+def lex_buffer(input_string):
+    # Same tokens as lex() in a compact TokenBuffer, the values are slices of input_string made on access
+    buffer = TokenBuffer(input_string, TokenType, token_value, Token)
+    append = buffer.append
+    for match in master_pattern.finditer(input_string):
+        append(token_types[match.lastgroup], match.start(), match.end())
+    append(TokenType.EOF, len(input_string), len(input_string))
+    return buffer
+
+def relex_buffer(buffer, offset, deleted, inserted):
+    # Updates a buffer from lex_buffer() after an edit of its source, see token_buffer.relex.
+    # A quote that no pattern matched (there is no quote after it) becomes a string once a quote
+    # is typed after it, so in that case scanning starts again from that quote.
+    source = buffer.source
+    quote = source.rfind('"', 0, offset)
+    if quote != -1:
+        i = bisect.bisect_right(buffer.starts, quote) - 1
+        if i < 0 or buffer.ends[i] <= quote:
+            inserted = source[quote:offset] + inserted
+            deleted += offset - quote
+            offset = quote
+    def scan(text, position):
+        for match in master_pattern.finditer(text, position):
+            yield token_types[match.lastgroup], match.start(), match.end()
+        yield TokenType.EOF, len(text), len(text)
+    return relex(buffer, offset, deleted, inserted, scan)
+
+def lex_stream(readable, chunk_size=1 << 16):
+    # Same tokens as lex(), read from a file-like object in chunks and yielded lazily. Only the unscanned
+    # tail of the input is buffered. A match that touches the end of the buffer (a word or number
+    # that may continue) or a quote whose closing quote has not arrived yet waits for the next chunk.
+    # Memory is bounded by the chunk size and the longest token, except after a quote that is never
+    # closed: everything from it to the end of the input is kept until the end, since the string may
+    # still close in any later chunk. The chunks read while waiting are only searched for a quote,
+    # and the buffer is scanned again once one arrives, so waiting stays linear in the input.
+    buffer = ''
+    position = 0
+    offset = 0  # source offset of buffer[0]
+    at_end = False
+    open_quote = False  # buffer[position] is a quote with no closing quote in the buffer
+    waiting = []  # chunks read while open_quote is set
+    while not at_end:
+        chunk = readable.read(chunk_size)
+        at_end = not chunk
+        if open_quote and not at_end and '"' not in chunk:
+            waiting.append(chunk)
+            continue
+        if waiting:
+            buffer += ''.join(waiting)
+            waiting = []
+        buffer += chunk
+        open_quote = False
+        for match in master_pattern.finditer(buffer, position):
+            if not at_end:
+                start = match.start()
+                quote = buffer.find('"', position, start) if start != position else -1
+                if quote != -1:
+                    # The quote was skipped, so no quote follows it in the buffer
+                    position = quote
+                    open_quote = True
+                    break
+                if match.end() == len(buffer):
+                    position = start
+                    break
+            yield Token(token_types[match.lastgroup], match.group(), offset + match.start(), offset + match.end())
+            position = match.end()
+        else:
+            if not at_end:
+                quote = buffer.find('"', position)
+                position = len(buffer) if quote == -1 else quote
+                open_quote = quote != -1
+        # One character before the scan position is kept so that \b sees the right context
+        keep = max(position - 1, 0)
+        buffer = buffer[keep:]
+        position -= keep
+        offset += keep
+    end = offset + len(buffer)
+    yield Token(TokenType.EOF, None, end, end)
+
+# Node types of the parse tree, the leaves are STRING and NUMBER nodes typed with TokenType
+class NodeType(enum.Enum):
+    SCRIPT = 'SCRIPT'
+    COMMAND = 'COMMAND'
+    ARGUMENT = 'ARGUMENT'
+    LIST = 'LIST'
+
+# Tokens that make up an unquoted value such as subject=Important Email
+WORD_TYPES = (TokenType.VARIABLE, TokenType.NUMBER, TokenType.KEYWORD)
+
+# Node types of an ArenaAST built by parse_arena(), also needed to load a serialized one
+ARENA_NODE_TYPES = list(NodeType) + list(TokenType)
+
+# Builds ASTNode objects for the parser, ArenaAST has the same two methods
+class NodeTree:
+    def node(self, type, value):
+        return ASTNode(type, value)
+
+    def add_child(self, parent, child):
+        parent.add_child(child)
+
+# ASTNode view of an ArenaAST node, the children are converted when they are first asked for
+class ArenaNode(ASTNode):
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+        self.type = arena.type(index)
+        self.value = arena.value(index)
+        self._children = None
+
+    @property
+    def children(self):
+        if self._children is None:
+            self._children = [ArenaNode(self.arena, child) for child in self.arena.children(self.index)]
+        return self._children
+
+# Predictive parser, one token of lookahead, newlines are skipped:
+#   script   -> command* EOF
+#   command  -> KEYWORD '(' [argument (',' argument)*] ')'
+#   argument -> (KEYWORD | VARIABLE) '=' value
+#   value    -> '[' [value (',' value)*] ']' | scalar
+#   scalar   -> STRING | (VARIABLE | NUMBER | KEYWORD)+
+class Parser:
+    def __init__(self, tokens, tree=None):
+        self.tree = NodeTree() if tree is None else tree  # builds the nodes, an ArenaAST or a NodeTree
+        self.tokens = iter(tokens)
+        self.end = Token(TokenType.EOF, None)  # for token streams without an EOF token
+        self.token = None
+        self.advance()
+
+    def advance(self):
+        token = next(self.tokens, self.end)
+        while token.type == TokenType.NEWLINE:
+            token = next(self.tokens, self.end)
+        self.token = token
+
+    def error(self, expected):
+        token = self.token
+        where = f' at offset {token.start}' if token.start is not None else ''
+        raise SyntaxError(f'Expected {expected}{where}, got {token.type.value} {token.value!r}')
+
+    def expect(self, token_type):
+        token = self.token
+        if token.type != token_type:
+            self.error(token_type.value)
+        self.advance()
+        return token
+
+    def script(self):
+        node = self.tree.node(NodeType.SCRIPT, None)
+        while self.token.type != TokenType.EOF:
+            self.tree.add_child(node, self.command())
+        return node
+
+    def command(self):
+        node = self.tree.node(NodeType.COMMAND, self.expect(TokenType.KEYWORD).value)
+        self.expect(TokenType.LPAREN)
+        if self.token.type != TokenType.RPAREN:
+            self.tree.add_child(node, self.argument())
+            while self.token.type == TokenType.COMMA:
+                self.advance()
+                self.tree.add_child(node, self.argument())
+        self.expect(TokenType.RPAREN)
+        return node
+
+    def argument(self):
+        token = self.token
+        if token.type != TokenType.KEYWORD and token.type != TokenType.VARIABLE:
+            self.error('an argument name')
+        self.advance()
+        node = self.tree.node(NodeType.ARGUMENT, token.value)
+        self.expect(TokenType.EQUALS)
+        self.tree.add_child(node, self.value())
+        return node
+
+    def value(self):
+        # Lists are parsed with an explicit stack of the open LIST nodes instead of recursion,
+        # so how deeply they nest is not limited by the interpreter's recursion limit
+        if self.token.type != TokenType.LBRACKET:
+            return self.scalar()
+        tree = self.tree
+        stack = []
+        root = None
+        while True:
+            # A value is expected here
+            if self.token.type == TokenType.LBRACKET:
+                node = tree.node(NodeType.LIST, None)
+                if stack:
+                    tree.add_child(stack[-1], node)
+                else:
+                    root = node
+                stack.append(node)
+                self.advance()
+                if self.token.type != TokenType.RBRACKET:
+                    continue
+            else:
+                tree.add_child(stack[-1], self.scalar())
+            # After a value (or '[' of an empty list): ']' closes lists until a ',' comes
+            while self.token.type != TokenType.COMMA:
+                self.expect(TokenType.RBRACKET)
+                stack.pop()
+                if not stack:
+                    return root
+            self.advance()
+
+    def scalar(self):
+        token = self.token
+        if token.type == TokenType.STRING:
+            self.advance()
+            return self.tree.node(TokenType.STRING, token.value[1:-1])
+        if token.type not in WORD_TYPES:
+            self.error('a value')
+        self.advance()
+        if self.token.type not in WORD_TYPES:
+            return self.tree.node(token.type if token.type == TokenType.NUMBER else TokenType.STRING, token.value)
+        words = [token.value]
+        while self.token.type in WORD_TYPES:
+            words.append(self.token.value)
+            self.advance()
+        return self.tree.node(TokenType.STRING, ' '.join(words))
+
 def parse(tokens):
+    # tokens is a list from lex(), a TokenBuffer or a stream from lex_stream(), read once from left to right
     ast = AST()
-    current_keyword = None
-    current_values = {}
-    keyword_stack = []
-
-    for token in tokens:
-        if token.type == TokenType.KEYWORD:
-            current_keyword = token.value
-            keyword_stack.append(current_keyword)
-        elif token.type == TokenType.EQUALS:
-            pass  # Ignore the equals sign
-        elif token.type == TokenType.STRING or token.type == TokenType.VARIABLE:
-            current_value = token.value.strip('"\', ')  # Strip quotes and whitespace
-            if current_keyword and current_value:
-                if current_keyword not in current_values:
-                    current_values[current_keyword] = []
-                current_values[current_keyword].append(current_value)
-        elif token.type == TokenType.NUMBER:
-            current_value = token.value
-            if current_keyword and current_value:
-                if current_keyword not in current_values:
-                    current_values[current_keyword] = []
-                current_values[current_keyword].append(current_value)
-
-    # Construct AST nodes for each keyword and its associated values
-    for keyword in keyword_stack:
-        keyword_node = ASTNode(TokenType.KEYWORD, keyword)
-        values = current_values.get(keyword, [])
-        for value in values:
-            if isinstance(value, int) or (isinstance(value, str) and value.isdigit()):
-                # Handle numbers
-                value_node = ASTNode(TokenType.NUMBER, value)
-            elif isinstance(value, str) and value.startswith('"') and value.endswith('"'):
-                # Handle strings enclosed in double quotes
-                value_node = ASTNode(TokenType.STRING, value.strip('"'))
-            elif isinstance(value, str) and value.startswith("'") and value.endswith("'"):
-                # Handle strings enclosed in single quotes
-                value_node = ASTNode(TokenType.STRING, value.strip("'"))
-            else:
-                # Handle other string values
-                value_node = ASTNode(TokenType.STRING, value)
-            keyword_node.add_child(value_node)
-        ast.insert(keyword_node)
+    ast.insert(Parser(tokens).script())
+    return ast
 
+def parse_arena(tokens, arena=None):
+    # Like parse(), into an ArenaAST. Many scripts can share one arena (and its string table),
+    # the root of every parsed script is appended to arena.roots.
+    if arena is None:
+        arena = ArenaAST(ARENA_NODE_TYPES)
+    arena.roots.append(Parser(tokens, arena).script())
+    return arena
+
+def arena_to_ast(arena, index=None):
+    # AST over arena nodes, ASTNode objects are only made for the parts of the tree that are visited
+    ast = AST()
+    ast.insert(ArenaNode(arena, arena.roots[-1] if index is None else index))
     return ast
 
 
@@ -161,4 +422,5 @@ def test():
     print("AST construction complete.")
     ast.visualize()
 
-test()
\ No newline at end of file
+if __name__ == "__main__":
+    test()
\ No newline at end of file
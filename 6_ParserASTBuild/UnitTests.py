@@ -0,0 +1,227 @@
+from ParserASTBuild import (ARENA_NODE_TYPES, AST, ASTNode, ArenaAST, NodeType, Token, TokenType, arena_to_ast, lex, lex_buffer, lex_stream, parse,
+                            parse_arena, relex_buffer, token_patterns)
+from batch_parse import BatchParser, content_key, load_arena
+import io
+import json
+import random
+import re
+import unittest
+
+def reference_lex(input_string):
+    # The original pattern-by-pattern lexer
+    tokens = []
+    position = 0
+    while position < len(input_string):
+        match = None
+        for token_type, regex in token_patterns:
+            match = re.compile(regex).match(input_string, position)
+            if match:
+                tokens.append(Token(token_type, match.group()))
+                position = match.end()
+                break
+        if not match:
+            position += 1
+    tokens.append(Token(TokenType.EOF, None))
+    return tokens
+
+def as_pairs(tokens):
+    return [(token.type, token.value) for token in tokens]
+
+def as_tuples(node):
+    if not node.children:
+        return node.type.value, node.value
+    return node.type.value, node.value, [as_tuples(child) for child in node.children]
+
+def with_spans(tokens):
+    return [(token.type, token.value, token.start, token.end) for token in tokens]
+
+class TestParserASTBuildMethods(unittest.TestCase):
+    def setUp(self):
+        self.script = """
+    send(
+        email="dcretu@example.com",
+        cc=["cc1@example.com", "cc2@example.com"],
+        subject=Important Email,
+        body=LFA laboratory work 3
+    )
+    attach(file="lab_report.pdf")
+    template(name="report_template")
+    """
+
+    def test_lex(self):
+        tokens = lex('send(email="a@b.c", n=12)\n')
+        self.assertEqual(as_pairs(tokens), [
+            (TokenType.KEYWORD, 'send'), (TokenType.LPAREN, '('), (TokenType.KEYWORD, 'email'),
+            (TokenType.EQUALS, '='), (TokenType.STRING, '"a@b.c"'), (TokenType.COMMA, ','),
+            (TokenType.VARIABLE, 'n'), (TokenType.EQUALS, '='), (TokenType.NUMBER, '12'),
+            (TokenType.RPAREN, ')'), (TokenType.NEWLINE, '\n'), (TokenType.EOF, None)])
+
+    def test_lex_matches_reference(self):
+        self.assertEqual(as_pairs(lex(self.script)), as_pairs(reference_lex(self.script)))
+        rng = random.Random(6)
+        alphabet = 'sendcb1_2 ="[],()\n\t@.x'
+        for _ in range(300):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            self.assertEqual(as_pairs(lex(text)), as_pairs(reference_lex(text)), repr(text))
+
+    def test_lex_stream(self):
+        self.assertEqual(as_pairs(lex_stream(io.StringIO(self.script), 5)), as_pairs(lex(self.script)))
+        # A quote that is never closed, and one that is closed many chunks later
+        for text in ('x " ' + 'send(cc=1)\n' * 50, 'x " ' + 'send(cc=1)\n' * 50 + '" y'):
+            self.assertEqual(with_spans(lex_stream(io.StringIO(text), 3)), with_spans(lex(text)))
+        rng = random.Random(12)
+        alphabet = 'sendcb1_2 ="[],()\n\t@.x'
+        for _ in range(300):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            for chunk_size in (1, 2, 7):
+                self.assertEqual(with_spans(lex_stream(io.StringIO(text), chunk_size)), with_spans(lex(text)),
+                                 (text, chunk_size))
+
+    def test_lex_buffer(self):
+        tokens = lex(self.script)
+        buffer = lex_buffer(self.script)
+        self.assertEqual(with_spans(buffer), with_spans(tokens))
+        self.assertEqual(list(buffer.values), [token.value for token in tokens])
+        for token in tokens[:-1]:
+            self.assertEqual(self.script[token.start:token.end], token.value)
+
+    def test_relex_buffer(self):
+        rng = random.Random(16)
+        alphabet = 'sendcb1_2 ="[],()\n\t@.x'
+        for _ in range(300):
+            text = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 30)))
+            buffer = lex_buffer(text)
+            for _ in range(3):
+                offset = rng.randint(0, len(text))
+                deleted = rng.randint(0, min(4, len(text) - offset))
+                inserted = ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 4)))
+                text = text[:offset] + inserted + text[offset + deleted:]
+                buffer, changed = relex_buffer(buffer, offset, deleted, inserted)
+                self.assertEqual(with_spans(buffer), with_spans(lex(text)), repr(text))
+
+    def test_parse(self):
+        tree = as_tuples(parse(lex(self.script)).root)
+        self.assertEqual(tree, ('SCRIPT', None, [
+            ('COMMAND', 'send', [
+                ('ARGUMENT', 'email', [('STRING', 'dcretu@example.com')]),
+                ('ARGUMENT', 'cc', [('LIST', None, [('STRING', 'cc1@example.com'), ('STRING', 'cc2@example.com')])]),
+                ('ARGUMENT', 'subject', [('STRING', 'Important Email')]),
+                ('ARGUMENT', 'body', [('STRING', 'LFA laboratory work 3')])]),
+            ('COMMAND', 'attach', [('ARGUMENT', 'file', [('STRING', 'lab_report.pdf')])]),
+            ('COMMAND', 'template', [('ARGUMENT', 'name', [('STRING', 'report_template')])])]))
+        self.assertEqual(as_tuples(parse(lex_buffer(self.script)).root), tree)
+        self.assertEqual(as_tuples(parse(lex_stream(io.StringIO(self.script), 8)).root), tree)
+
+    def test_parse_repeated_commands(self):
+        root = parse(lex('send(cc=[])\nsend(cc=[[1, "a"]], n=2)')).root
+        self.assertEqual(as_tuples(root), ('SCRIPT', None, [
+            ('COMMAND', 'send', [('ARGUMENT', 'cc', [('LIST', None)])]),
+            ('COMMAND', 'send', [('ARGUMENT', 'cc', [('LIST', None, [('LIST', None, [('NUMBER', '1'), ('STRING', 'a')])])]),
+                                 ('ARGUMENT', 'n', [('NUMBER', '2')])])]))
+        self.assertEqual(root.children[0].type, NodeType.COMMAND)
+        self.assertEqual(as_tuples(parse(lex('')).root), ('SCRIPT', None))
+
+    def test_parse_errors(self):
+        for script in ('send(', 'send(cc)', 'send(cc=)', 'send(cc=[1 2,)', '(cc=1)', 'send(cc=1))',
+                       'send(cc=[1,])', 'send(cc=[[1])', 'send(cc=[[]]])'):
+            with self.assertRaises(SyntaxError):
+                parse(lex(script))
+
+    def test_parse_deep_lists(self):
+        script = 'send(cc=' + '[' * 5000 + '1' + ']' * 5000 + ', n=2)'
+        arena = parse_arena(lex_buffer(script))
+        self.assertEqual(max(depth for _, depth in arena.walk()), 5003)
+        self.assertEqual(len(arena), 5006)
+        self.assertEqual(as_tuples(parse(lex('send(cc=[[], [[1]], 2])')).root), ('SCRIPT', None, [
+            ('COMMAND', 'send', [('ARGUMENT', 'cc', [('LIST', None, [
+                ('LIST', None), ('LIST', None, [('LIST', None, [('NUMBER', '1')])]), ('NUMBER', '2')])])])]))
+
+    def test_parse_arena(self):
+        arena = parse_arena(lex(self.script))
+        parse_arena(lex(self.script), arena)
+        self.assertEqual(len(arena.roots), 2)
+        self.assertEqual(len(arena.strings), 16)  # the second script adds no new strings
+        tree = as_tuples(parse(lex(self.script)).root)
+        for root in arena.roots:
+            self.assertEqual(as_tuples(arena_to_ast(arena, root).root), tree)
+
+        walked = [(arena.type(i).value, arena.value(i), depth) for i, depth in arena.walk()]
+        self.assertEqual(walked[:5], [('SCRIPT', None, 0), ('COMMAND', 'send', 1), ('ARGUMENT', 'email', 2),
+                                      ('STRING', 'dcretu@example.com', 3), ('ARGUMENT', 'cc', 2)])
+        self.assertEqual(len(walked), len(arena) // 2)
+
+        class Arguments:
+            def __init__(self):
+                self.names = []
+
+            def visit_argument(self, arena, index):
+                self.names.append(arena.value(index))
+        visitor = Arguments()
+        arena.visit(visitor, arena.roots[0])
+        self.assertEqual(visitor.names, ['email', 'cc', 'subject', 'body', 'file', 'name'])
+
+    def test_batch_parse(self):
+        scripts = [self.script.replace('dcretu', f'user{i % 3}') for i in range(10)] + ['send(n=1)']
+        for workers in (1, 2):
+            with BatchParser(workers=workers, cache_size=2, chunk_size=1) as batch:
+                results = batch.parse_many(scripts)
+                for script, data in zip(scripts, results):
+                    self.assertEqual(as_tuples(arena_to_ast(load_arena(data)).root), as_tuples(parse(lex(script)).root))
+                stats = batch.stats()
+                self.assertEqual((stats['parsed'], stats['cache_hits'], stats['cached']), (4, 7, 2))
+                batch.parse_many([scripts[8], scripts[-1]])  # both still in the cache
+                self.assertEqual(batch.stats()['parsed'], 4)
+                results = batch.parse_many(['send(', 'send(m=1)', 'send(', 'send(cc)'])
+                self.assertIsInstance(results[0], SyntaxError)
+                self.assertIs(results[2], results[0])
+                self.assertIsInstance(results[3], SyntaxError)
+                self.assertEqual(as_tuples(arena_to_ast(load_arena(results[1])).root), as_tuples(parse(lex('send(m=1)')).root))
+                stats = batch.stats()
+                self.assertEqual((stats['parsed'], stats['errors'], stats['cached']), (7, 3, 2))
+                self.assertIn(content_key('send(m=1)'), batch.cache)
+                # A lone surrogate can not be serialized as UTF-8, only that script fails
+                results = batch.parse_many(['send(n=1)', 'send(a="\ud800")'])
+                self.assertIsInstance(results[0], bytes)
+                self.assertIsInstance(results[1], UnicodeEncodeError)
+                self.assertEqual(batch.stats()['errors'], 4)
+
+    def test_export(self):
+        ast = parse(lex(self.script))
+        dot = io.StringIO()
+        ast.write_dot(dot)
+        lines = dot.getvalue().splitlines()
+        self.assertEqual(lines[:4], ['digraph {', '\tn0 [label="SCRIPT"]', '\tn1 [label="COMMAND: send"]', '\tn0 -> n1'])
+        self.assertEqual(lines[-1], '}')
+
+        text = io.StringIO()
+        ast.write_json(text)
+        def as_json(node):
+            return {'type': node.type.value, 'value': node.value, 'children': [as_json(child) for child in node.children]}
+        self.assertEqual(json.loads(text.getvalue()), as_json(ast.root))
+
+        data = io.BytesIO()
+        ast.write_binary(data)
+        arena = ArenaAST.from_bytes(data.getvalue(), ARENA_NODE_TYPES)
+        self.assertEqual(as_tuples(arena_to_ast(arena).root), as_tuples(ast.root))
+
+    def test_export_deep_tree(self):
+        # Far deeper than the recursion limit
+        ast = AST()
+        node = ast.root = ASTNode(NodeType.LIST, None)
+        for _ in range(20000):
+            child = ASTNode(NodeType.LIST, None)
+            node.add_child(child)
+            node = child
+        node.add_child(ASTNode(TokenType.STRING, 'x "quoted"'))
+        dot = io.StringIO()
+        ast.write_dot(dot)
+        self.assertIn('\tn20001 [label="STRING: x \\"quoted\\""]', dot.getvalue())
+        text = io.StringIO()
+        ast.write_json(text)
+        self.assertTrue(text.getvalue().endswith('"children": []}' + ']}' * 20001))
+        data = io.BytesIO()
+        ast.write_binary(data)
+        self.assertEqual(len(ArenaAST.from_bytes(data.getvalue(), ARENA_NODE_TYPES)), 20002)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import struct
+import sys
+from array import array
+
+NONE = -1  # no value, no child or no sibling
+
+# Serialized form, little-endian: header, then values, first_child, next_sibling and roots as int32,
+# the UTF-8 byte length of every string as uint32, the kind codes as bytes and the UTF-8 string bytes
+MAGIC = b'AAST'
+VERSION = 1
+HEADER = struct.Struct('<4sHHIII')  # magic, version, number of node types, nodes, strings, roots
+
+
+class ArenaAST:
+    # Nodes of one or more parse trees stored in parallel arrays, a node is an index into them.
+    # Children are linked through first_child/next_sibling, values are indices into a string table
+    # in which every distinct value (keywords, addresses, argument names) is stored once.
+    def __init__(self, node_types):
+        self.node_types = list(node_types)  # kind code -> node type
+        self.codes = {node_type: code for code, node_type in enumerate(self.node_types)}
+        self.kinds = array('B')
+        self.values = array('i')
+        self.first_child = array('i')
+        self.next_sibling = array('i')
+        self.last_child = array('i')  # only used while children are appended
+        self.strings = []
+        self.string_index = {}
+        self.roots = []
+
+    def intern(self, value):
+        if value is None:
+            return NONE
+        index = self.string_index.get(value)
+        if index is None:
+            index = self.string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def node(self, node_type, value):
+        self.kinds.append(self.codes[node_type])
+        self.values.append(self.intern(value))
+        self.first_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.last_child.append(NONE)
+        return len(self.kinds) - 1
+
+    def add_child(self, parent, child):
+        last = self.last_child[parent]
+        if last == NONE:
+            self.first_child[parent] = child
+        else:
+            self.next_sibling[last] = child
+        self.last_child[parent] = child
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def type(self, index):
+        return self.node_types[self.kinds[index]]
+
+    def value(self, index):
+        value = self.values[index]
+        return None if value == NONE else self.strings[value]
+
+    def children(self, index):
+        child = self.first_child[index]
+        while child != NONE:
+            yield child
+            child = self.next_sibling[child]
+
+    def walk(self, index=None):
+        # Pre-order (index, depth) pairs of a tree, the last root by default, without recursion
+        if index is None:
+            index = self.roots[-1]
+        first_child, next_sibling = self.first_child, self.next_sibling
+        stack = [(index, 0)]
+        while stack:
+            index, depth = stack.pop()
+            yield index, depth
+            sibling = next_sibling[index]
+            if sibling != NONE and depth:
+                stack.append((sibling, depth))
+            child = first_child[index]
+            if child != NONE:
+                stack.append((child, depth + 1))
+
+    def visit(self, visitor, index=None):
+        # Calls visitor.visit_<node type>(arena, index), e.g. visit_argument, for the nodes of a tree in pre-order
+        methods = [getattr(visitor, f'visit_{node_type.name.lower()}', None) for node_type in self.node_types]
+        kinds = self.kinds
+        for index, _ in self.walk(index):
+            method = methods[kinds[index]]
+            if method is not None:
+                method(self, index)
+
+    def nbytes(self):
+        # Memory used by the node arrays, the string table is not counted
+        return sum(column.itemsize * len(column)
+                   for column in (self.kinds, self.values, self.first_child, self.next_sibling, self.last_child))
+
+    def to_bytes(self):
+        strings = [string.encode('utf-8') for string in self.strings]
+        columns = [array('i', column) for column in (self.values, self.first_child, self.next_sibling, self.roots)]
+        columns.append(array('I', map(len, strings)))
+        if sys.byteorder != 'little':
+            for column in columns:
+                column.byteswap()
+        header = HEADER.pack(MAGIC, VERSION, len(self.node_types), len(self.kinds), len(strings), len(self.roots))
+        return b''.join([header] + [column.tobytes() for column in columns] + [self.kinds.tobytes()] + strings)
+
+    @classmethod
+    def from_bytes(cls, data, node_types):
+        magic, version, n_types, n_nodes, n_strings, n_roots = HEADER.unpack_from(data)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("not a serialized arena AST")
+        arena = cls(node_types)
+        if n_types != len(arena.node_types):
+            raise ValueError("node types do not match the serialized arena AST")
+        offset = HEADER.size
+        columns = []
+        for typecode, size in (('i', n_nodes), ('i', n_nodes), ('i', n_nodes), ('i', n_roots), ('I', n_strings)):
+            column = array(typecode)
+            column.frombytes(data[offset:offset + 4 * size])
+            if sys.byteorder != 'little':
+                column.byteswap()
+            columns.append(column)
+            offset += 4 * size
+        arena.values, arena.first_child, arena.next_sibling, roots, lengths = columns
+        arena.roots = list(roots)
+        arena.kinds = array('B', data[offset:offset + n_nodes])
+        offset += n_nodes
+        for length in lengths:
+            arena.strings.append(str(data[offset:offset + length], 'utf-8'))
+            offset += length
+        arena.string_index = {string: index for index, string in enumerate(arena.strings)}
+        # last_child is not stored, it is rebuilt so that more nodes can be added after loading
+        arena.last_child = array('i', [NONE]) * n_nodes
+        next_sibling = arena.next_sibling
+        for parent, child in enumerate(arena.first_child):
+            while child != NONE:
+                arena.last_child[parent] = child
+                child = next_sibling[child]
+        return arena
@@ -0,0 +1,172 @@
+# Parses many mail scripts at once into serialized arena ASTs.
+#
+#   python batch_parse.py scripts/*.mail --workers 4 --output-dir asts
+#
+# Identical scripts are parsed once: inputs are keyed by a hash of their content, and the
+# serialized trees of recent inputs are kept in a bounded LRU cache across batches. The
+# unique scripts of a batch are split over a process pool. Time spent in lex, parse and
+# serialize is summed over the workers and reported on stderr. A script that fails (a SyntaxError,
+# or any other exception while it is lexed, parsed or serialized) gets that exception as result
+# and is reported on stderr, the exit status is then 1.
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from ParserASTBuild import ARENA_NODE_TYPES, ArenaAST, lex_buffer, parse_arena
+
+STAGES = ('lex', 'parse', 'serialize')
+
+
+def content_key(script):
+    # surrogatepass, so that a script with a lone surrogate gets its own result instead of failing the batch
+    return hashlib.blake2b(script.encode('utf-8', 'surrogatepass'), digest_size=16).digest()
+
+
+def load_arena(data):
+    # ArenaAST from the bytes returned by BatchParser.parse_many
+    return ArenaAST.from_bytes(data, ARENA_NODE_TYPES)
+
+
+def _parse_chunk(scripts):
+    # Runs in the workers: one serialized arena (or the exception it failed with) per script, plus the
+    # time spent in every stage. A failure only ends its own script, the rest of the chunk goes on.
+    timings = dict.fromkeys(STAGES, 0.0)
+    results = []
+    clock = time.perf_counter
+    for script in scripts:
+        stage = 'lex'
+        started = clock()
+        try:
+            tokens = lex_buffer(script)
+            now = clock()
+            timings[stage] += now - started
+            stage, started = 'parse', now
+            arena = parse_arena(tokens)
+            now = clock()
+            timings[stage] += now - started
+            stage, started = 'serialize', now
+            results.append(arena.to_bytes())
+        except Exception as error:
+            results.append(error)
+        timings[stage] += clock() - started
+    return results, timings
+
+
+class BatchParser:
+    def __init__(self, workers=None, cache_size=4096, chunk_size=64):
+        self.workers = os.cpu_count() if workers is None else workers
+        self.cache_size = cache_size
+        self.chunk_size = chunk_size  # scripts sent to a worker at a time
+        self.cache = OrderedDict()  # content key -> serialized arena, least recently used first
+        self.timings = dict.fromkeys(STAGES, 0.0)
+        self.timings['wall'] = 0.0
+        self.scripts = 0
+        self.hits = 0
+        self.parsed = 0
+        self.errors = 0
+        self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def stats(self):
+        return {'scripts': self.scripts, 'cache_hits': self.hits, 'parsed': self.parsed, 'errors': self.errors,
+                'cached': len(self.cache), **{f'{stage}_s': seconds for stage, seconds in self.timings.items()}}
+
+    def parse_many(self, scripts):
+        # One result per script, in the order of scripts: the serialized arena AST (see load_arena), or
+        # the exception of a script that failed (SyntaxError when it does not parse). Only parsed scripts
+        # are cached, so a failing script is parsed again when it comes back in a later batch.
+        started = time.perf_counter()
+        results = [None] * len(scripts)
+        pending = OrderedDict()  # content key -> indices of the scripts with that content
+        for i, script in enumerate(scripts):
+            key = content_key(script)
+            data = self.cache.get(key)
+            if data is not None:
+                self.cache.move_to_end(key)
+                self.hits += 1
+                results[i] = data
+            elif key in pending:
+                self.hits += 1
+                pending[key].append(i)
+            else:
+                pending[key] = [i]
+
+        unique = [scripts[indices[0]] for indices in pending.values()]
+        chunks = [unique[i:i + self.chunk_size] for i in range(0, len(unique), self.chunk_size)]
+        if self.workers <= 1 or len(chunks) <= 1:
+            outputs = map(_parse_chunk, chunks)
+        else:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers)
+            outputs = self._pool.map(_parse_chunk, chunks)
+
+        parsed = []
+        for chunk_results, timings in outputs:
+            parsed.extend(chunk_results)
+            for stage, seconds in timings.items():
+                self.timings[stage] += seconds
+        for (key, indices), data in zip(pending.items(), parsed):
+            for i in indices:
+                results[i] = data
+            if isinstance(data, Exception):
+                self.errors += len(indices)
+                continue
+            self.cache[key] = data
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+        self.scripts += len(scripts)
+        self.parsed += len(unique)
+        self.timings['wall'] += time.perf_counter() - started
+        return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parse mail scripts into serialized arena ASTs.")
+    parser.add_argument('paths', nargs='+', help="script files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="worker processes, 1 runs inline")
+    parser.add_argument('--cache-size', type=int, default=4096, help="serialized trees kept for repeated scripts")
+    parser.add_argument('--output-dir', help="writes <script name>.ast for every script")
+    args = parser.parse_args(argv)
+
+    scripts = []
+    for path in args.paths:
+        with open(path, encoding='utf-8') as file:
+            scripts.append(file.read())
+    with BatchParser(args.workers, args.cache_size) as batch:
+        results = batch.parse_many(scripts)
+        stats = batch.stats()
+
+    for path, data in zip(args.paths, results):
+        if isinstance(data, Exception):
+            print(f"{path}: {data}", file=sys.stderr)
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+        for path, data in zip(args.paths, results):
+            if isinstance(data, Exception):
+                continue
+            with open(os.path.join(args.output_dir, os.path.basename(path) + '.ast'), 'wb') as file:
+                file.write(data)
+    print(f"{stats['scripts']} scripts, {stats['parsed']} parsed, {stats['errors']} failed, "
+          f"{stats['cache_hits']} from cache in {stats['wall_s']:.2f} s (lex {stats['lex_s']:.2f} s, parse {stats['parse_s']:.2f} s, "
+          f"serialize {stats['serialize_s']:.2f} s)", file=sys.stderr)
+    return 1 if stats['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())